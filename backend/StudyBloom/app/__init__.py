@@ -1,11 +1,10 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
+from flask import Flask, jsonify, redirect, request
+from flask_login import LoginManager, login_url
 from flask_cors import CORS
 from flask_migrate import Migrate   # ✅ add this
 from config import Config
+from app.models.schema import db   # the models' instance, so create_all() and queries see them
 
-db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()   # ✅ add this
 
@@ -21,10 +20,25 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    from app.auth.user_cache import init_user_cache, load_cached_user
+    init_user_cache(app)
+
+    from app.auth.hashing import init_hashing
+    init_hashing(app)
+
+    from app.auth.tokens import init_jwt
+    init_jwt(app, login_manager)
+
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models.schema import User
-        return User.query.get(int(user_id))
+        return load_cached_user(int(user_id))
+
+    @login_manager.unauthorized_handler
+    def unauthorized():
+        # API clients need a 401 to know they should refresh or log in; browsers get the login page
+        if request.path.startswith('/api/') or request.headers.get('Authorization', '').startswith('Bearer '):
+            return jsonify({'error': 'Authentication required'}), 401
+        return redirect(login_url(login_manager.login_view, next_url=request.url))
 
     # Register blueprints
     from app.auth.routes import auth_bp
@@ -35,6 +49,12 @@ def create_app():
     from app.reminders.routes import reminders_bp
     from app.rewards.routes import rewards_bp
     from app.groups.routes import groups_bp
+    from app.sync.routes import sync_bp
+    from app.dashboard.routes import dashboard_bp, init_dashboard_cache
+    from app.batch.routes import batch_bp
+    from app.search.routes import search_bp
+    from app.tags.routes import tags_bp
+    from app.focus.routes import focus_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(subscription_bp)
@@ -44,5 +64,33 @@ def create_app():
     app.register_blueprint(reminders_bp)
     app.register_blueprint(rewards_bp)
     app.register_blueprint(groups_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(tags_bp)
+    app.register_blueprint(focus_bp)
+    init_dashboard_cache(app)
+
+    from app.streaks.stats import init_stats_cache
+    init_stats_cache(app)
+
+    from app.search.index import init_search
+    init_search()
+
+    from app.tags.stats import init_tag_stats
+    init_tag_stats()
+
+    from app.rewards.routes import init_reward_stats_cache
+    init_reward_stats_cache(app)
+
+    from app.rewards.worker import init_reward_worker
+    init_reward_worker(app)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.scheduler import init_scheduler
+    init_scheduler(app)
 
     return app
@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingPoolBusy(Exception):
+    """Raised when too many hash jobs are already queued"""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing pool is saturated')
+        self.retry_after = retry_after
+
+
+_settings = {
+    'workers': 2,
+    'queue_depth': 16,
+    'timeout': 10,
+    'retry_after': 2,
+    'method': 'pbkdf2:sha256:600000'
+}
+_pool = None
+_pool_pid = None
+_slots = None
+_lock = threading.Lock()
+
+
+def init_hashing(app):
+    """Load pool sizing and the target hash method from config"""
+    _settings['workers'] = app.config.get('HASH_POOL_WORKERS', _settings['workers'])
+    _settings['queue_depth'] = app.config.get('HASH_QUEUE_DEPTH', _settings['queue_depth'])
+    _settings['timeout'] = app.config.get('HASH_TIMEOUT', _settings['timeout'])
+    _settings['retry_after'] = app.config.get('HASH_RETRY_AFTER', _settings['retry_after'])
+    _settings['method'] = app.config.get('PASSWORD_HASH_METHOD', _settings['method'])
+
+
+def hash_password(password):
+    """Hash with the configured method on the worker pool"""
+    return _run(generate_password_hash, password, _settings['method'])
+
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash on the worker pool"""
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when the stored hash was made with a different method or cost"""
+    method = password_hash.split('$', 1)[0] if password_hash else ''
+    return method != _settings['method']
+
+
+def _get_pool():
+    # Pools don't survive a fork, so each gunicorn worker builds its own
+    global _pool, _pool_pid, _slots
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=_settings['workers'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pool_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(_settings['queue_depth'])
+        return _pool, _slots
+
+
+def _run(func, *args):
+    if _settings['workers'] <= 0:
+        return func(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingPoolBusy(_settings['retry_after'])
+
+    try:
+        future = pool.submit(func, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=_settings['timeout'])
+    except TimeoutError:
+        raise HashingPoolBusy(_settings['retry_after'])
@@ -1,11 +1,21 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.models.schema import User
+from app.auth.user_cache import user_cache, load_cached_user
+from app.auth.hashing import HashingPoolBusy, hash_password, needs_rehash
+from app.auth.tokens import issue_tokens
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, create_access_token
 from app import db
 
 auth_bp = Blueprint('auth', __name__)
 
+def _hashing_busy_response(exc):
+    """503 with Retry-After when the hashing pool is saturated"""
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(exc.retry_after)
+    return response
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -39,7 +49,7 @@ def register():
             new_user = User(
                 username=username,
                 email=email,
-                password_hash=generate_password_hash(password, method='sha256')
+                password_hash=hash_password(password)
             )
             db.session.add(new_user)
             db.session.commit()
@@ -57,6 +67,9 @@ def register():
                 flash('Registration successful! Please log in.')
                 return redirect(url_for('auth.login'))
                 
+        except HashingPoolBusy as e:
+            db.session.rollback()
+            return _hashing_busy_response(e)
         except Exception as e:
             db.session.rollback()
             if request.is_json:
@@ -90,18 +103,34 @@ def login():
         
         # Find user and verify password
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            authenticated = user is not None and user.check_password(password)
+        except HashingPoolBusy as e:
+            return _hashing_busy_response(e)
+        
+        if authenticated:
+            # Transparently upgrade legacy hashes to the configured method
+            if needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = hash_password(password)
+                    db.session.commit()
+                except HashingPoolBusy:
+                    db.session.rollback()
+            
             login_user(user)
             
             if request.is_json:
-                return jsonify({
+                payload = {
                     'message': 'Login successful!',
                     'user': {
                         'id': user.id,
                         'username': user.username,
                         'email': user.email
                     }
-                }), 200
+                }
+                if current_app.config.get('JWT_AUTH_ENABLED'):
+                    payload.update(issue_tokens(user))
+                return jsonify(payload), 200
             else:
                 return redirect(url_for('dashboard'))
         else:
@@ -115,6 +144,28 @@ def login():
         return jsonify({'error': 'GET method not allowed for JSON'}), 405
     return render_template('login.html')
 
+@auth_bp.route('/api/token/refresh', methods=['POST'])
+def refresh_access_token():
+    """Exchange a refresh token for a new access token"""
+    if not current_app.config.get('JWT_AUTH_ENABLED'):
+        return jsonify({'error': 'Token authentication is disabled'}), 404
+    
+    try:
+        verify_jwt_in_request(refresh=True)
+    except Exception:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    
+    claims = get_jwt()
+    user = load_cached_user(int(claims['sub']))
+    if not user or not user.is_active:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims={'username': user.username}
+    )
+    return jsonify({'access_token': access_token}), 200
+
 @auth_bp.route('/logout')
 @login_required
 def logout():
@@ -170,4 +221,11 @@ def update_user_profile():
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Failed to update profile'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to update profile'}), 500
+
+@auth_bp.route('/api/user/cache-stats', methods=['GET'])
+@login_required
+def get_user_cache_stats():
+    """Hit/miss counters for this worker's user loader cache"""
+    return jsonify(user_cache.stats()), 200
+
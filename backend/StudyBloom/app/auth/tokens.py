@@ -0,0 +1,80 @@
+from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, decode_token
+from flask_login import UserMixin
+from app.auth.user_cache import load_cached_user
+
+jwt = JWTManager()
+
+
+class TokenUser(UserMixin):
+    """Request user rebuilt from JWT claims; other attributes come from the cached DB row"""
+
+    _own_attrs = ('id', 'username', '_user')
+
+    def __init__(self, user_id, username=None, user=None):
+        object.__setattr__(self, 'id', user_id)
+        object.__setattr__(self, '_user', user)
+        if username is not None:
+            object.__setattr__(self, 'username', username)
+
+    @property
+    def is_active(self):
+        return self._record().is_active
+
+    def _record(self):
+        if self._user is None:
+            object.__setattr__(self, '_user', load_cached_user(self.id))
+        return self._user
+
+    def __getattr__(self, name):
+        # Only reached for attributes the claims don't carry
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._record(), name)
+
+    def __setattr__(self, name, value):
+        if name in self._own_attrs:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._record(), name, value)
+
+
+def init_jwt(app, login_manager):
+    """Enable bearer tokens on /api routes when JWT_AUTH_ENABLED is set"""
+    if not app.config.get('JWT_AUTH_ENABLED'):
+        return
+
+    jwt.init_app(app)
+
+    @login_manager.request_loader
+    def load_user_from_request(request):
+        if not request.path.startswith('/api/'):
+            return None
+
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+
+        try:
+            claims = decode_token(auth_header[len('Bearer '):])
+        except Exception:
+            return None
+
+        if claims.get('type') != 'access':
+            return None
+
+        # Served from the user cache; a deleted or deactivated account's
+        # tokens stop working before they expire (the unauthorized handler
+        # in create_app answers 401, not a 500 later)
+        user = load_cached_user(int(claims['sub']))
+        if user is None or not user.is_active:
+            return None
+        return TokenUser(user.id, claims.get('username'), user)
+
+
+def issue_tokens(user):
+    """Short-lived access token plus a refresh token for the given user"""
+    claims = {'username': user.username}
+    return {
+        'access_token': create_access_token(identity=str(user.id), additional_claims=claims),
+        'refresh_token': create_refresh_token(identity=str(user.id), additional_claims=claims)
+    }
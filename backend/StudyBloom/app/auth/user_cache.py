@@ -0,0 +1,41 @@
+from sqlalchemy.orm import make_transient_to_detached
+from app.cache import TTLCache, invalidate_on_commit
+from app.models.schema import db, User
+
+# Per-process cache of detached User snapshots keyed by id
+user_cache = TTLCache()
+
+_listeners_installed = False
+
+
+def init_user_cache(app):
+    """Size the cache from config and hook commit-time invalidation"""
+    global _listeners_installed
+    user_cache.maxsize = app.config.get('USER_CACHE_SIZE', 1024)
+    user_cache.ttl = app.config.get('USER_CACHE_TTL', 300)
+
+    if not _listeners_installed:
+        invalidate_on_commit(user_cache, [User], key=lambda user: user.id)
+        _listeners_installed = True
+
+
+def load_cached_user(user_id):
+    """Return the user attached to the current session, hitting the DB only on a miss"""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return db.session.merge(cached, load=False)
+
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+
+    user_cache.set(user_id, _snapshot(user))
+    return user
+
+
+def _snapshot(user):
+    """Detached, clean copy of the user's column state"""
+    columns = User.__mapper__.column_attrs
+    copy = User(**{attr.key: getattr(user, attr.key) for attr in columns})
+    make_transient_to_detached(copy)
+    return copy
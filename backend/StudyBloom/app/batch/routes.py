@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_login import login_required
+from app.auth.tokens import TokenUser
+from app.cache import DEFER_COMMIT_HOOKS, invalidate_pending
+from app.models.schema import db, User
+from sqlalchemy.orm import Session
+from werkzeug.test import EnvironBuilder
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_BATCH_REQUESTS = 20
+ALLOWED_METHODS = {'GET', 'POST', 'PUT', 'DELETE'}
+# Credentials are forwarded so each sub-request sees the same user
+FORWARDED_HEADERS = ('Cookie', 'Authorization')
+
+
+@contextmanager
+def single_transaction():
+    """Run the block's commits as savepoints inside one outer transaction.
+
+    Views keep calling ``db.session.commit()``; while this is active those
+    only release savepoints, and the caller decides whether the outer
+    transaction commits or rolls back. Commit hooks (cache invalidation,
+    reward checks) are held back until then: replayed if the caller
+    commits, otherwise the caches are invalidated, since reads in the
+    batch may have cached the discarded writes, and the rest dropped.
+    """
+    connection = db.engine.connect()
+    outer = connection.begin()
+    session = Session(bind=connection, join_transaction_mode='create_savepoint')
+    session.info[DEFER_COMMIT_HOOKS] = True
+    previous = db.session.registry()
+    db.session.registry.set(session)
+
+    # current_user belongs to the previous session; views must write through this one
+    user = g.get('_login_user')
+    if isinstance(user, TokenUser):
+        record = user._user
+        user._user = None
+    elif isinstance(user, User):
+        g._login_user = session.merge(user)
+
+    committed = False
+    try:
+        yield outer
+        committed = not outer.is_active
+    finally:
+        del session.info[DEFER_COMMIT_HOOKS]
+        if committed:
+            session.dispatch.after_commit(session)
+        else:
+            invalidate_pending(session)
+            session.dispatch.after_rollback(session)
+        session.close()
+        db.session.registry.set(previous)
+        if isinstance(user, TokenUser):
+            user._user = record
+        elif user is not None:
+            g._login_user = user
+        if outer.is_active:
+            outer.rollback()
+        connection.close()
+
+
+def dispatch_subrequest(sub):
+    """Run one sub-request through the app in-process and return (status, body)"""
+    method = str(sub.get('method', 'GET')).upper()
+    path = sub.get('path', '')
+    if method not in ALLOWED_METHODS:
+        return 405, {'error': f'Method {method} not allowed in a batch'}
+    if not path.startswith('/api/') or path.startswith('/api/batch'):
+        return 400, {'error': 'Only /api/ endpoints can be batched'}
+
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        headers=headers,
+        json=sub.get('body') if method in ('POST', 'PUT') else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        # Shares this request's app context, so the DB session and the
+        # already-loaded current_user are reused
+        with current_app.request_context(builder.get_environ()):
+            response = current_app.full_dispatch_request()
+    except Exception:
+        db.session.rollback()
+        return 500, {'error': 'An unexpected error occurred'}
+    finally:
+        builder.close()
+
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True) or None
+    return response.status_code, body
+
+@batch_bp.route('/api/batch', methods=['POST'])
+@login_required
+def run_batch():
+    """Dispatch several API calls in one HTTP round trip"""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+    
+    data = request.json
+    subrequests = data.get('requests')
+    if not isinstance(subrequests, list) or not subrequests:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(subrequests) > MAX_BATCH_REQUESTS:
+        return jsonify({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'}), 400
+    if any(not isinstance(sub, dict) for sub in subrequests):
+        return jsonify({'error': 'Each request must be an object'}), 400
+    
+    if not data.get('atomic'):
+        responses = []
+        for sub in subrequests:
+            status, body = dispatch_subrequest(sub)
+            responses.append({'status': status, 'body': body})
+        return jsonify({'responses': responses, 'committed': True})
+    
+    # Atomic: stop at the first failure and roll everything back
+    responses = []
+    with single_transaction() as outer:
+        for sub in subrequests:
+            status, body = dispatch_subrequest(sub)
+            responses.append({'status': status, 'body': body})
+            if status >= 400:
+                break
+        committed = all(r['status'] < 400 for r in responses)
+        if committed:
+            outer.commit()
+    
+    return jsonify({'responses': responses, 'committed': committed}), 200 if committed else 409
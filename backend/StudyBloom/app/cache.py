@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Marker for "invalidate everything" after a bulk statement
+_ALL = object()
+
+# (cache, models, keys, pending_key) for every invalidate_on_commit registration
+_registrations = []
+
+# Set in session.info while commits are only savepoints of a larger
+# transaction (atomic /api/batch); commit hooks then wait for the real outcome
+DEFER_COMMIT_HOOKS = 'defer_commit_hooks'
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def _invalidate(cache, pending):
+    if not pending:
+        return
+    if _ALL in pending:
+        cache.clear()
+        return
+    for cache_key in pending:
+        cache.invalidate(cache_key)
+
+
+def invalidate_pending(session):
+    """Apply every pending invalidation now, without waiting for a commit.
+
+    For writes that are being thrown away after other reads in the same
+    transaction may have cached them.
+    """
+    for cache, _, _, pending_key in _registrations:
+        _invalidate(cache, session.info.pop(pending_key, None))
+
+
+def invalidate_on_commit(cache, models, key, multi=False):
+    """Drop ``cache`` entries for rows of ``models`` once their transaction commits.
+
+    ``key(obj)`` maps a flushed instance to its cache key, or with
+    ``multi=True`` to an iterable of keys. Bulk UPDATE or DELETE
+    statements against those models clear the whole cache, since the
+    affected keys aren't known, unless they run with the
+    ``cache_keys_recorded=True`` execution option: hot-path helpers that
+    know which users they touch pass it and call ``record_write`` instead.
+    """
+    models = tuple(models)
+    pending_key = ('cache_invalidate', id(cache))
+    keys = key if multi else (lambda obj: (key(obj),))
+
+    def collect_writes(session, flush_context):
+        pending = session.info.setdefault(pending_key, set())
+        for obj in session.new | session.dirty | session.deleted:
+            if isinstance(obj, models):
+                pending.update(keys(obj))
+
+    def collect_bulk_writes(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if orm_execute_state.execution_options.get('cache_keys_recorded'):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, models):
+            orm_execute_state.session.info.setdefault(pending_key, set()).add(_ALL)
+
+    def invalidate_committed(session):
+        if not session.info.get(DEFER_COMMIT_HOOKS):
+            _invalidate(cache, session.info.pop(pending_key, None))
+
+    def discard_pending(session):
+        if not session.info.get(DEFER_COMMIT_HOOKS):
+            session.info.pop(pending_key, None)
+
+    _registrations.append((cache, models, keys, pending_key))
+    event.listen(Session, 'after_flush', collect_writes)
+    event.listen(Session, 'do_orm_execute', collect_bulk_writes)
+    event.listen(Session, 'after_commit', invalidate_committed)
+    event.listen(Session, 'after_rollback', discard_pending)
+
+
+def record_write(session, model, **attrs):
+    """Invalidate like an ORM write to ``model`` would, for Core statements.
+
+    ``attrs`` stands in for the written row (e.g. ``user_id=...``) when
+    computing cache keys, so a targeted upsert drops just that entry
+    rather than the whole cache.
+    """
+    row = SimpleNamespace(**attrs)
+    for _, models, keys, pending_key in _registrations:
+        if issubclass(model, models):
+            session.info.setdefault(pending_key, set()).update(keys(row))
@@ -0,0 +1,102 @@
+import click
+from flask import current_app
+
+
+def register_commands(app):
+    """Maintenance commands, run with ``flask --app run <command>``"""
+
+    @app.cli.command('prune-tombstones')
+    def prune_tombstones_command():
+        """Delete sync tombstones older than the retention window"""
+        from app.sync.tombstones import prune_tombstones
+        deleted = prune_tombstones(current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+        click.echo(f'Pruned {deleted} tombstones')
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Refill the SQLite full-text index (Postgres indexes need no rebuild)"""
+        from app.search.index import rebuild_fts_index
+        from app.models.schema import db
+        if db.session.get_bind().dialect.name != 'sqlite':
+            click.echo('Postgres search uses expression indexes; nothing to rebuild')
+            return
+        click.echo(f'Indexed {rebuild_fts_index()} rows')
+
+    @app.cli.command('rebuild-tag-stats')
+    def rebuild_tag_stats_command():
+        """Recompute the per-user tag totals behind /api/tags"""
+        from app.tags.stats import rebuild_tag_stats
+        click.echo(f'Rebuilt {rebuild_tag_stats()} tag rows')
+
+    @app.cli.command('reconcile-goals')
+    def reconcile_goals_command():
+        """Recompute goal progress from tasks and study sessions"""
+        from app.tasks.progress import reconcile_goals
+        click.echo(f'Corrected {reconcile_goals()} goals')
+
+    @app.cli.command('rebuild-activity')
+    def rebuild_activity_command():
+        """Rebuild every user's daily activity bitmap from history"""
+        from app.streaks.activity import rebuild_bitmaps
+        click.echo(f'Rebuilt {rebuild_bitmaps()} activity bitmaps')
+
+    @app.cli.command('rollover-streaks')
+    @click.option('--batch-size', default=None, type=int, help='Rows reset per transaction')
+    @click.option('--backfill-legacy', is_flag=True, help='First give old rows a lapses_at')
+    def rollover_streaks_command(batch_size, backfill_legacy):
+        """Reset every streak whose last local day has ended"""
+        from app.streaks.rollover import rollover_streaks, backfill_lapses_at
+        if backfill_legacy:
+            click.echo(f'Backfilled lapses_at on {backfill_lapses_at()} streaks')
+        reset, elapsed = rollover_streaks(batch_size=batch_size or current_app.config['STREAK_ROLLOVER_BATCH_SIZE'])
+        click.echo(f'Reset {reset} lapsed streaks in {elapsed:.2f}s')
+
+    @app.cli.command('close-stale-sessions')
+    @click.option('--hours', default=None, type=int, help='Close sessions with no activity for this long')
+    def close_stale_sessions_command(hours):
+        """End study sessions that were never stopped"""
+        from app.streaks.stale import close_stale_sessions
+        closed, elapsed = close_stale_sessions(
+            stale_after_hours=hours or current_app.config['STALE_SESSION_HOURS'],
+            batch_size=current_app.config['STALE_SESSION_BATCH_SIZE']
+        )
+        click.echo(f'Closed {closed} stale sessions in {elapsed:.2f}s')
+
+    @app.cli.command('rebuild-daily-stats')
+    def rebuild_daily_stats_command():
+        """Recompute the per-day study rollup from sessions and tasks"""
+        from app.streaks.rollup import rebuild_daily_stats
+        click.echo(f'Rebuilt {rebuild_daily_stats()} user-days')
+
+    @app.cli.command('downsample-focus')
+    def downsample_focus_command():
+        """Fold old raw focus samples into per-minute aggregates"""
+        from app.focus.samples import downsample_samples
+        folded = downsample_samples(current_app.config['FOCUS_RAW_RETENTION_HOURS'])
+        click.echo(f'Folded {folded} focus samples')
+
+    @app.cli.command('seed-reward-rules')
+    @click.option('--backfill-legacy', is_flag=True, help='Also tag rewards granted before the catalog')
+    def seed_reward_rules_command(backfill_legacy):
+        """Add the built-in reward rules missing from the catalog"""
+        from app.rewards.rules import seed_reward_rules, backfill_rule_codes
+        click.echo(f'Added {seed_reward_rules()} reward rules')
+        if backfill_legacy:
+            click.echo(f'Tagged {backfill_rule_codes()} existing rewards')
+
+    @app.cli.command('unlock-rewards')
+    @click.option('--batch-size', default=1000, type=int, help='Users evaluated per transaction')
+    def unlock_rewards_command(batch_size):
+        """Grant every user the catalog rewards they have earned"""
+        from app.rewards.rules import unlock_earned
+        from app.models.schema import db, User
+        unlocked = 0
+        last_id = 0
+        while True:
+            user_ids = db.session.query(User.id).filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1][0]
+            unlocked += len(unlock_earned([user_id for (user_id,) in user_ids]))
+            db.session.commit()
+        click.echo(f'Unlocked {unlocked} rewards')
@@ -0,0 +1,138 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from app.models.schema import db, User, Goal, Task, Reminder, Streak, StudySession, Reward, DailyUserStat
+from app.cache import TTLCache, invalidate_on_commit
+from app.serializers import task_serializer, reminder_serializer, reward_serializer
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, or_
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+GROUP_STREAK_REQUIREMENT = 20
+TOP_N = 5
+
+open_task_serializer = task_serializer.only(
+    'id', 'goal_id', 'title', 'status', 'priority', 'due_date', 'position'
+)
+upcoming_serializer = reminder_serializer.only(
+    'id', 'task_id', 'title', 'reminder_time', 'notification_type'
+)
+available_serializer = reward_serializer.only(
+    'id', 'reward_type', 'reward_value', 'description', 'expires_at'
+)
+
+# Per-user payloads, dropped whenever one of the user's rows is written
+dashboard_cache = TTLCache()
+_listeners_installed = False
+
+
+def init_dashboard_cache(app):
+    global _listeners_installed
+    dashboard_cache.maxsize = app.config.get('DASHBOARD_CACHE_SIZE', 1024)
+    dashboard_cache.ttl = app.config.get('DASHBOARD_CACHE_TTL', 30)
+
+    if not _listeners_installed:
+        invalidate_on_commit(dashboard_cache, [User], key=lambda user: user.id)
+        invalidate_on_commit(
+            dashboard_cache,
+            [Goal, Task, Reminder, Streak, StudySession, Reward, DailyUserStat],
+            key=lambda obj: obj.user_id
+        )
+        _listeners_installed = True
+
+
+def _available_reward_filter(user_id, now):
+    return (
+        Reward.user_id == user_id,
+        Reward.is_used == False,
+        or_(Reward.expires_at.is_(None), Reward.expires_at > now)
+    )
+
+
+def build_dashboard(user_id, now):
+    """Gather the home screen data with five small statements"""
+    # 1. Streak row plus scalar aggregates in one round trip
+    session_count = select(func.coalesce(func.sum(DailyUserStat.session_count), 0)).where(
+        DailyUserStat.user_id == user_id
+    ).scalar_subquery()
+    session_minutes = select(func.coalesce(func.sum(DailyUserStat.study_minutes), 0)).where(
+        DailyUserStat.user_id == user_id
+    ).scalar_subquery()
+    rewards_available = select(func.count(Reward.id)).where(
+        *_available_reward_filter(user_id, now)
+    ).scalar_subquery()
+    summary = db.session.query(
+        Streak.current_streak, Streak.longest_streak, Streak.last_activity_date,
+        session_count, session_minutes, rewards_available
+    ).select_from(User).outerjoin(Streak, Streak.user_id == User.id).filter(
+        User.id == user_id
+    ).first()
+    current, longest, last_activity, total_sessions, total_time, reward_count = summary
+    current = current or 0
+
+    # 2. Task counts by status
+    task_counts = dict(db.session.query(Task.status, func.count(Task.id)).filter(
+        Task.user_id == user_id
+    ).group_by(Task.status).all())
+
+    # 3-5. Short top-N lists instead of whole collections
+    open_tasks = open_task_serializer.query(
+        Task.user_id == user_id,
+        Task.status.in_(('pending', 'in_progress'))
+    ).order_by(Task.position, Task.id).limit(TOP_N).all()
+
+    reminders = upcoming_serializer.query(
+        Reminder.user_id == user_id,
+        Reminder.reminder_time >= now,
+        Reminder.reminder_time <= now + timedelta(days=1),
+        Reminder.status == 'pending'
+    ).order_by(Reminder.reminder_time).limit(TOP_N).all()
+
+    rewards = available_serializer.query(
+        *_available_reward_filter(user_id, now)
+    ).order_by(Reward.created_at.desc()).limit(TOP_N).all()
+
+    return {
+        'streak': {
+            'current_streak': current,
+            'longest_streak': longest or 0,
+            'last_activity_date': last_activity.isoformat() if last_activity else None
+        },
+        'analytics': {
+            'total_study_sessions': total_sessions,
+            'total_study_time': total_time,
+            'average_session_length': round(total_time / total_sessions, 2) if total_sessions else 0
+        },
+        'tasks': {
+            'counts': task_counts,
+            'open': open_task_serializer.dump_rows(open_tasks)
+        },
+        'upcoming_reminders': upcoming_serializer.dump_rows(reminders),
+        'available_rewards': {
+            'count': reward_count,
+            'items': available_serializer.dump_rows(rewards)
+        },
+        'group_eligibility': {
+            'eligible': current >= GROUP_STREAK_REQUIREMENT,
+            'current_streak': current,
+            'required_streak': GROUP_STREAK_REQUIREMENT
+        },
+        'generated_at': now.isoformat()
+    }
+
+@dashboard_bp.route('/api/dashboard', methods=['GET'])
+@login_required
+def get_dashboard():
+    """Everything the home screen needs in one response"""
+    payload = dashboard_cache.get(current_user.id)
+    if payload is None:
+        payload = build_dashboard(current_user.id, datetime.utcnow())
+        dashboard_cache.set(current_user.id, payload)
+    
+    return jsonify(dict(payload, user={
+        'id': current_user.id,
+        'username': current_user.username,
+        'email': current_user.email,
+        'first_name': current_user.first_name,
+        'last_name': current_user.last_name
+    }))
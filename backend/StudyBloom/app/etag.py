@@ -0,0 +1,45 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import func
+from app.models.schema import db
+
+
+def collection_version(model, user_id, *criteria):
+    """(row count, max updated_at) for one user's rows.
+
+    Served by the (user_id, updated_at) index without touching the table,
+    so it is far cheaper than loading and serializing the collection.
+    """
+    count, last_updated = db.session.query(
+        func.count(), func.max(model.updated_at)
+    ).filter(model.user_id == user_id, *criteria).one()
+    return count, last_updated.isoformat() if last_updated else None
+
+
+def conditional_get(version_func):
+    """Answer If-None-Match with 304 when ``version_func()`` hasn't changed.
+
+    ``version_func`` receives the current user's id and returns any
+    hashable description of the collection's state.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_func(current_user.id)
+            raw = repr((request.full_path, current_user.id, version)).encode()
+            etag = hashlib.sha1(raw).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from app.models.schema import db, StudySession
+from app.focus.samples import insert_samples, parse_samples, InvalidSamples
+
+focus_bp = Blueprint('focus', __name__)
+
+@focus_bp.route('/api/study-sessions/<int:session_id>/samples', methods=['POST'])
+@login_required
+def ingest_samples(session_id):
+    """Append focus/heartbeat samples to an open session.
+
+    Accepts ``{"samples": [[unix_seconds, focus], ...]}`` as JSON, or one
+    ``[unix_seconds, focus]`` array per line as application/x-ndjson.
+    """
+    # Locking the session row orders this batch before or after a concurrent end
+    session = StudySession.query.filter_by(
+        id=session_id, user_id=current_user.id
+    ).with_for_update().first_or_404()
+    if session.end_time:
+        return jsonify({'error': 'Session already ended'}), 409
+    
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            rows = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            rows = (request.get_json(silent=True) or {}).get('samples')
+        samples = parse_samples(
+            rows, session, datetime.utcnow(), current_app.config.get('FOCUS_MAX_SAMPLES_PER_REQUEST', 1000)
+        )
+    except (InvalidSamples, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The client already batches, so each POST is one INSERT in this request's transaction
+    if samples:
+        insert_samples(samples)
+    db.session.commit()
+    return jsonify({'accepted': len(samples)}), 202
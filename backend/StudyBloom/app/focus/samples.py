@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, literal_column, select, text, union_all
+from app.models.schema import db, FocusSample, FocusMinute
+from app.upsert import insert_for
+
+FOCUS_MIN = 0
+FOCUS_MAX = 10
+
+
+class InvalidSamples(ValueError):
+    pass
+
+
+def parse_samples(rows, session, now, max_samples):
+    """Validate ``[[unix_seconds, focus_or_null], ...]`` into insertable dicts.
+
+    A null focus is a heartbeat: it proves the timer was running without
+    reporting a focus level.
+    """
+    if not isinstance(rows, list):
+        raise InvalidSamples('samples must be a list of [timestamp, focus] pairs')
+    if len(rows) > max_samples:
+        raise InvalidSamples(f'At most {max_samples} samples per request')
+
+    earliest = session.start_time - timedelta(minutes=1)
+    latest = now + timedelta(minutes=1)
+    parsed = []
+    for row in rows:
+        try:
+            timestamp, focus = row
+            recorded_at = datetime.utcfromtimestamp(float(timestamp))
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise InvalidSamples('Each sample must be [unix_seconds, focus]')
+        if not earliest <= recorded_at <= latest:
+            raise InvalidSamples('Sample timestamp outside the session')
+        if focus is not None and (not isinstance(focus, (int, float)) or not FOCUS_MIN <= focus <= FOCUS_MAX):
+            raise InvalidSamples(f'focus must be between {FOCUS_MIN} and {FOCUS_MAX} or null')
+        parsed.append({
+            'session_id': session.id,
+            'recorded_at': recorded_at,
+            'focus': None if focus is None else int(round(focus))
+        })
+    return parsed
+
+
+def insert_samples(rows):
+    """One multi-row INSERT per request; retried batches are deduplicated on (session_id, recorded_at)"""
+    statement = insert_for(db.session.get_bind())(FocusSample.__table__).on_conflict_do_nothing()
+    db.session.execute(statement, rows)
+
+
+def _minute(column):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.strftime('%Y-%m-%d %H:%M:00', column)
+    return func.date_trunc('minute', column)
+
+
+def _activity(session_ids):
+    """{session id: (active minutes, focus count, focus sum)} in one grouped query"""
+    raw = select(
+        FocusSample.session_id,
+        _minute(FocusSample.recorded_at).label('minute'),
+        func.count(FocusSample.focus).label('focus_count'),
+        func.coalesce(func.sum(FocusSample.focus), 0).label('focus_sum')
+    ).where(FocusSample.session_id.in_(session_ids)).group_by(FocusSample.session_id, literal_column('minute'))
+    rolled = select(
+        FocusMinute.session_id, FocusMinute.minute, FocusMinute.focus_count, FocusMinute.focus_sum
+    ).where(FocusMinute.session_id.in_(session_ids))
+    minutes = union_all(raw, rolled).subquery()
+
+    rows = db.session.query(
+        minutes.c.session_id,
+        func.count(func.distinct(minutes.c.minute)),
+        func.coalesce(func.sum(minutes.c.focus_count), 0),
+        func.coalesce(func.sum(minutes.c.focus_sum), 0)
+    ).group_by(minutes.c.session_id)
+    return {session_id: tuple(values) for session_id, *values in rows}
+
+
+def _scores(started_at, ended_at, active_minutes=0, focus_count=0, focus_sum=0):
+    focus_score = None
+    if focus_count:
+        focus_score = min(max(int(round(focus_sum / focus_count)), 1), 10)
+
+    productivity_score = None
+    length = max(int((ended_at - started_at).total_seconds() // 60), 1)
+    if active_minutes:
+        productivity_score = min(max(int(round(10 * active_minutes / length)), 1), 10)
+    return focus_score, productivity_score
+
+
+def score_sessions(sessions):
+    """Set focus_score/productivity_score (1-10) on ended ``sessions`` from their samples.
+
+    Focus is the mean reported focus. Productivity is the share of the
+    session's minutes that have any sample or heartbeat. One SQL
+    aggregate over the raw samples plus already-downsampled minutes
+    covers every session passed in.
+    """
+    activity = _activity([session.id for session in sessions])
+    for session in sessions:
+        focus_score, productivity_score = _scores(
+            session.start_time, session.end_time, *activity.get(session.id, ())
+        )
+        if focus_score is not None:
+            session.focus_score = focus_score
+        if productivity_score is not None:
+            session.productivity_score = productivity_score
+
+
+def downsample_samples(older_than_hours):
+    """Fold raw samples older than the cutoff into per-minute rows and delete them.
+
+    On PostgreSQL the move is one DELETE ... RETURNING feeding the upsert,
+    so overlapping runs on several nodes can't fold a sample twice.
+    Returns the number of raw samples folded.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        result = db.session.execute(text("""
+            WITH moved AS (
+                DELETE FROM focus_samples WHERE recorded_at < :cutoff
+                RETURNING session_id, recorded_at, focus
+            ), folded AS (
+                INSERT INTO focus_minutes (session_id, minute, samples, focus_count, focus_sum)
+                SELECT session_id, date_trunc('minute', recorded_at), COUNT(*), COUNT(focus), COALESCE(SUM(focus), 0)
+                FROM moved
+                GROUP BY 1, 2
+                ON CONFLICT (session_id, minute) DO UPDATE SET
+                    samples = focus_minutes.samples + excluded.samples,
+                    focus_count = focus_minutes.focus_count + excluded.focus_count,
+                    focus_sum = focus_minutes.focus_sum + excluded.focus_sum
+            )
+            SELECT COUNT(*) FROM moved
+        """), {'cutoff': cutoff})
+        folded = result.scalar()
+    else:
+        db.session.execute(text("""
+            INSERT INTO focus_minutes (session_id, minute, samples, focus_count, focus_sum)
+            SELECT session_id, strftime('%Y-%m-%d %H:%M:00', recorded_at), COUNT(*), COUNT(focus), COALESCE(SUM(focus), 0)
+            FROM focus_samples
+            WHERE recorded_at < :cutoff
+            GROUP BY 1, 2
+            ON CONFLICT (session_id, minute) DO UPDATE SET
+                samples = focus_minutes.samples + excluded.samples,
+                focus_count = focus_minutes.focus_count + excluded.focus_count,
+                focus_sum = focus_minutes.focus_sum + excluded.focus_sum
+        """), {'cutoff': cutoff})
+        folded = db.session.execute(text(
+            'DELETE FROM focus_samples WHERE recorded_at < :cutoff'
+        ), {'cutoff': cutoff}).rowcount
+    db.session.commit()
+    return folded
@@ -1,10 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
 db = SQLAlchemy()
 
+# Tag lists: native arrays on PostgreSQL (GIN-indexed), JSON arrays in the local SQLite setup
+TagList = ARRAY(db.String(255)).with_variant(db.JSON, 'sqlite')
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
     
@@ -39,10 +42,12 @@ class User(db.Model, UserMixin):
     created_groups = db.relationship('Group', backref='creator', lazy=True, foreign_keys='Group.creator_id')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.auth.hashing import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from app.auth.hashing import verify_password
+        return verify_password(self.password_hash, password)
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
@@ -64,6 +69,15 @@ class Subscription(db.Model):
 
 class Goal(db.Model):
     __tablename__ = 'goals'
+    __table_args__ = (
+        db.Index('idx_goals_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('idx_goals_user_updated', 'user_id', 'updated_at'),
+        db.Index(
+            'idx_goals_search',
+            db.text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"),
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -88,6 +102,16 @@ class Goal(db.Model):
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('idx_tasks_user_position', 'user_id', 'position', 'id'),
+        db.Index('idx_tasks_user_updated', 'user_id', 'updated_at'),
+        db.Index(
+            'idx_tasks_search',
+            db.text("to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, ''))"),
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+        db.Index('idx_tasks_tags', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -101,8 +125,9 @@ class Task(db.Model):
     actual_minutes = db.Column(db.Integer)
     completed_at = db.Column(db.DateTime)
     reminder_sent = db.Column(db.Boolean, default=False)
-    position = db.Column(db.Integer, default=0)
-    tags = db.Column(db.ARRAY(db.String(255)), default=[])
+    position = db.Column(db.Integer, default=0, nullable=False)
+    # active_history: app.tags.stats subtracts the replaced tags at flush
+    tags = db.column_property(db.Column(TagList, default=[]), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -111,6 +136,10 @@ class Task(db.Model):
 
 class Reminder(db.Model):
     __tablename__ = 'reminders'
+    __table_args__ = (
+        db.Index('idx_reminders_user_time', 'user_id', 'reminder_time', 'id'),
+        db.Index('idx_reminders_user_updated', 'user_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -127,12 +156,18 @@ class Reminder(db.Model):
 
 class Streak(db.Model):
     __tablename__ = 'streaks'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'streak_type', name='uq_streaks_user_type'),
+        db.Index('idx_streaks_lapses_at', 'lapses_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     current_streak = db.Column(db.Integer, default=0)
     longest_streak = db.Column(db.Integer, default=0)
     last_activity_date = db.Column(db.Date)
+    # UTC instant of the local midnight after which the streak is broken
+    lapses_at = db.Column(db.DateTime)
     total_days_active = db.Column(db.Integer, default=0)
     streak_type = db.Column(db.String(20), default='daily')
     goal_streak_days = db.Column(db.Integer, default=7)
@@ -142,27 +177,49 @@ class Streak(db.Model):
 
 class StudySession(db.Model):
     __tablename__ = 'study_sessions'
+    __table_args__ = (
+        db.Index('idx_study_sessions_user_start', 'user_id', 'start_time', 'id'),
+        db.Index('idx_study_sessions_user_updated', 'user_id', 'updated_at'),
+        db.Index(
+            'idx_study_sessions_open', 'start_time',
+            postgresql_where=db.text('end_time IS NULL'), sqlite_where=db.text('end_time IS NULL')
+        ),
+        db.Index(
+            'idx_study_sessions_search',
+            db.text("to_tsvector('english', coalesce(subject, '') || ' ' || coalesce(notes, ''))"),
+            postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+        db.Index('idx_study_sessions_tags', 'tags', postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     goal_id = db.Column(db.Integer, db.ForeignKey('goals.id', ondelete='SET NULL'))
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime)
-    duration_minutes = db.Column(db.Integer)
+    # active_history on duration and tags: app.tags.stats subtracts the replaced values at flush
+    duration_minutes = db.column_property(db.Column(db.Integer), active_history=True)
     subject = db.Column(db.String(100))
     notes = db.Column(db.Text)
     focus_score = db.Column(db.Integer)
     productivity_score = db.Column(db.Integer)
     session_type = db.Column(db.String(20), default='individual')
-    tags = db.Column(db.ARRAY(db.String(255)), default=[])
+    tags = db.column_property(db.Column(TagList, default=[]), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Reward(db.Model):
     __tablename__ = 'rewards'
+    __table_args__ = (
+        db.Index('idx_rewards_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('idx_rewards_user_type_used', 'user_id', 'reward_type', 'is_used', 'reward_value'),
+        # A rule grants each user at most one reward; manual unlocks have no rule_code
+        db.UniqueConstraint('user_id', 'rule_code', name='uq_rewards_user_rule'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    rule_code = db.Column(db.String(50))
     reward_type = db.Column(db.String(50), nullable=False)
     reward_value = db.Column(db.Numeric(10, 2))
     description = db.Column(db.Text, nullable=False)
@@ -251,4 +308,83 @@ class Notification(db.Model):
     related_entity_type = db.Column(db.String(50))
     related_entity_id = db.Column(db.Integer)
     action_url = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Tombstone(db.Model):
+    __tablename__ = 'tombstones'
+    __table_args__ = (
+        db.Index('idx_tombstones_user_deleted', 'user_id', 'deleted_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Per-user tag totals, kept current on every task/session write (see app.tags.stats)
+class UserTagStat(db.Model):
+    __tablename__ = 'user_tag_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tag = db.Column(db.String(255), primary_key=True)
+    task_count = db.Column(db.Integer, default=0, nullable=False)
+    session_count = db.Column(db.Integer, default=0, nullable=False)
+    study_minutes = db.Column(db.Integer, default=0, nullable=False)
+
+# One bit per calendar day of activity, see app.streaks.activity
+class ActivityBitmap(db.Model):
+    __tablename__ = 'activity_bitmaps'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bits = db.Column(db.LargeBinary, nullable=False, default=b'')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Per user per local day totals, see app.streaks.rollup
+class DailyUserStat(db.Model):
+    __tablename__ = 'daily_user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    study_minutes = db.Column(db.Integer, default=0, nullable=False)
+    session_count = db.Column(db.Integer, default=0, nullable=False)
+    tasks_completed = db.Column(db.Integer, default=0, nullable=False)
+    focus_total = db.Column(db.Integer, default=0, nullable=False)
+    focus_count = db.Column(db.Integer, default=0, nullable=False)
+
+# Raw in-session samples; a NULL focus is a heartbeat. Folded into
+# FocusMinute once older than FOCUS_RAW_RETENTION_HOURS (see app.focus.samples)
+class FocusSample(db.Model):
+    __tablename__ = 'focus_samples'
+    __table_args__ = (
+        db.Index('idx_focus_samples_recorded', 'recorded_at'),
+    )
+    
+    session_id = db.Column(db.Integer, db.ForeignKey('study_sessions.id', ondelete='CASCADE'), primary_key=True)
+    recorded_at = db.Column(db.DateTime, primary_key=True)
+    focus = db.Column(db.SmallInteger)
+
+class FocusMinute(db.Model):
+    __tablename__ = 'focus_minutes'
+    
+    session_id = db.Column(db.Integer, db.ForeignKey('study_sessions.id', ondelete='CASCADE'), primary_key=True)
+    minute = db.Column(db.DateTime, primary_key=True)
+    samples = db.Column(db.Integer, default=0, nullable=False)
+    focus_count = db.Column(db.Integer, default=0, nullable=False)
+    focus_sum = db.Column(db.Integer, default=0, nullable=False)
+
+# Reward catalog: a user earns ``code`` once ``metric`` reaches ``threshold``
+# (see app.rewards.rules)
+class RewardRule(db.Model):
+    __tablename__ = 'reward_rules'
+    
+    code = db.Column(db.String(50), primary_key=True)
+    metric = db.Column(db.String(50), nullable=False)
+    threshold = db.Column(db.Integer, nullable=False)
+    reward_type = db.Column(db.String(50), nullable=False)
+    reward_value = db.Column(db.Numeric(10, 2))
+    description = db.Column(db.Text, nullable=False)
+    requirement = db.Column(db.String(255))
+    expires_after_days = db.Column(db.Integer)
+    active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_args():
+    """Read ?limit= and ?cursor= from the request, clamping the limit"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE)), request.args.get('cursor')
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor('Malformed cursor')
+        return [_coerce(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor') from e
+
+
+def _coerce(column, value):
+    if value is None:
+        return None
+    if column.type.python_type is datetime:
+        return datetime.fromisoformat(value)
+    return column.type.python_type(value)
+
+
+def keyset_page(query, columns, limit, cursor=None, descending=False):
+    """Fetch one page ordered by ``columns`` (a unique key, e.g. (position, id)).
+
+    Returns ``(rows, next_cursor)``; each page is a range scan on the
+    matching composite index rather than an OFFSET.
+    """
+    if cursor:
+        key = tuple_(*columns)
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < values if descending else key > values)
+
+    order = [c.desc() for c in columns] if descending else list(columns)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
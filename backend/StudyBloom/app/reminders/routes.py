@@ -2,25 +2,33 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from app.models.schema import db, Reminder, Task
 from datetime import datetime, timedelta
+from app.pagination import page_args, keyset_page, InvalidCursor
+from app.serializers import reminder_serializer, list_projection, InvalidProjection
+from app.etag import conditional_get, collection_version
+from app.sync.tombstones import record_tombstone
 
 reminders_bp = Blueprint('reminders', __name__)
 
+upcoming_serializer = reminder_serializer.only(
+    'id', 'task_id', 'title', 'message', 'reminder_time', 'notification_type'
+)
+
 @reminders_bp.route('/api/reminders', methods=['GET'])
 @login_required
 def get_reminders():
-    """Get all reminders for the current user"""
-    reminders = Reminder.query.filter_by(user_id=current_user.id).order_by(Reminder.reminder_time).all()
-    
-    return jsonify([{
-        'id': reminder.id,
-        'task_id': reminder.task_id,
-        'title': reminder.title,
-        'message': reminder.message,
-        'reminder_time': reminder.reminder_time.isoformat(),
-        'status': reminder.status,
-        'notification_type': reminder.notification_type,
-        'created_at': reminder.created_at.isoformat()
-    } for reminder in reminders])
+    """Get the current user's reminders by time, one keyset page at a time"""
+    limit, cursor = page_args()
+    keys = (Reminder.reminder_time, Reminder.id)
+    try:
+        serializer, criteria = list_projection(reminder_serializer, keys)
+        reminders, next_cursor = keyset_page(
+            serializer.query(Reminder.user_id == current_user.id, *criteria),
+            keys, limit, cursor
+        )
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': serializer.dump_rows(reminders), 'next_cursor': next_cursor})
 
 @reminders_bp.route('/api/reminders', methods=['POST'])
 @login_required
@@ -40,16 +48,7 @@ def create_reminder():
     db.session.add(new_reminder)
     db.session.commit()
     
-    return jsonify({
-        'id': new_reminder.id,
-        'task_id': new_reminder.task_id,
-        'title': new_reminder.title,
-        'message': new_reminder.message,
-        'reminder_time': new_reminder.reminder_time.isoformat(),
-        'status': new_reminder.status,
-        'notification_type': new_reminder.notification_type,
-        'created_at': new_reminder.created_at.isoformat()
-    }), 201
+    return jsonify(reminder_serializer.dump(new_reminder)), 201
 
 @reminders_bp.route('/api/reminders/<int:reminder_id>', methods=['PUT'])
 @login_required
@@ -72,6 +71,7 @@ def update_reminder(reminder_id):
 def delete_reminder(reminder_id):
     """Delete a reminder"""
     reminder = Reminder.query.filter_by(id=reminder_id, user_id=current_user.id).first_or_404()
+    record_tombstone(current_user.id, 'reminders', reminder.id)
     db.session.delete(reminder)
     db.session.commit()
     return jsonify({'message': 'Reminder deleted successfully'})
@@ -102,39 +102,32 @@ def create_task_reminder(task_id):
     db.session.add(new_reminder)
     db.session.commit()
     
-    return jsonify({
-        'id': new_reminder.id,
-        'task_id': new_reminder.task_id,
-        'title': new_reminder.title,
-        'message': new_reminder.message,
-        'reminder_time': new_reminder.reminder_time.isoformat(),
-        'status': new_reminder.status,
-        'notification_type': new_reminder.notification_type
-    }), 201
+    return jsonify(reminder_serializer.dump(new_reminder)), 201
+
+def _upcoming_version(user_id):
+    # The 24h window and time_until move every minute, so the minute is part of the version
+    minute = datetime.utcnow().replace(second=0, microsecond=0)
+    return collection_version(Reminder, user_id), minute.isoformat()
 
 @reminders_bp.route('/api/reminders/upcoming', methods=['GET'])
 @login_required
+@conditional_get(_upcoming_version)
 def get_upcoming_reminders():
     """Get upcoming reminders (next 24 hours)"""
     now = datetime.utcnow()
     tomorrow = now + timedelta(days=1)
     
-    reminders = Reminder.query.filter(
+    reminders = upcoming_serializer.query(
         Reminder.user_id == current_user.id,
         Reminder.reminder_time >= now,
         Reminder.reminder_time <= tomorrow,
         Reminder.status == 'pending'
     ).order_by(Reminder.reminder_time).all()
     
-    return jsonify([{
-        'id': reminder.id,
-        'task_id': reminder.task_id,
-        'title': reminder.title,
-        'message': reminder.message,
-        'reminder_time': reminder.reminder_time.isoformat(),
-        'notification_type': reminder.notification_type,
-        'time_until': int((reminder.reminder_time - now).total_seconds() / 60)  # minutes until reminder
-    } for reminder in reminders])
+    payload = upcoming_serializer.dump_rows(reminders)
+    for item, reminder in zip(payload, reminders):
+        item['time_until'] = int((reminder.reminder_time - now).total_seconds() / 60)  # minutes until reminder
+    return jsonify(payload)
 
 @reminders_bp.route('/api/reminders/send', methods=['POST'])
 @login_required
@@ -1,85 +1,100 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from app.models.schema import db, Reward, Streak
+from app.models.schema import db, Reward
 from datetime import datetime, timedelta
+from sqlalchemy import func
+from app.cache import TTLCache, invalidate_on_commit
+from app.pagination import page_args, keyset_page, InvalidCursor
+from app.serializers import reward_serializer, list_projection, InvalidProjection
+from app.rewards.rules import earned_rules, unlock_earned
 
 rewards_bp = Blueprint('rewards', __name__)
 
+available_serializer = reward_serializer.only(
+    'id', 'reward_type', 'reward_value', 'description', 'expires_at'
+)
+
+# Per-user /api/rewards/statistics payloads, dropped when one of the user's rewards is written
+reward_stats_cache = TTLCache()
+_listeners_installed = False
+
+
+def init_reward_stats_cache(app):
+    global _listeners_installed
+    reward_stats_cache.maxsize = app.config.get('REWARD_STATS_CACHE_SIZE', 1024)
+    reward_stats_cache.ttl = app.config.get('REWARD_STATS_CACHE_TTL', 60)
+
+    if not _listeners_installed:
+        invalidate_on_commit(reward_stats_cache, [Reward], key=lambda reward: reward.user_id)
+        _listeners_installed = True
+
+
+def build_reward_statistics(user_id):
+    """All statistics from one aggregate over the user's rewards, grouped by type and use"""
+    rows = db.session.query(
+        Reward.reward_type, Reward.is_used, func.count(), func.sum(Reward.reward_value)
+    ).filter(Reward.user_id == user_id).group_by(Reward.reward_type, Reward.is_used).all()
+    
+    by_type = dict.fromkeys(('discount', 'feature_unlock', 'badge'), 0)
+    total = used = 0
+    total_discount_value = 0
+    for reward_type, is_used, count, value in rows:
+        by_type[reward_type] = by_type.get(reward_type, 0) + count
+        total += count
+        if is_used:
+            used += count
+        if reward_type == 'discount':
+            total_discount_value += value or 0
+    
+    return {
+        'total_rewards': total,
+        'used_rewards': used,
+        'available_rewards': total - used,
+        'total_discount_value': float(total_discount_value),
+        'rewards_by_type': by_type
+    }
+
 @rewards_bp.route('/api/rewards', methods=['GET'])
 @login_required
 def get_rewards():
-    """Get all rewards for the current user"""
-    rewards = Reward.query.filter_by(user_id=current_user.id).order_by(Reward.created_at.desc()).all()
-    
-    return jsonify([{
-        'id': reward.id,
-        'reward_type': reward.reward_type,
-        'reward_value': reward.reward_value,
-        'description': reward.description,
-        'unlocked_at': reward.unlocked_at.isoformat() if reward.unlocked_at else None,
-        'expires_at': reward.expires_at.isoformat() if reward.expires_at else None,
-        'is_used': reward.is_used,
-        'created_at': reward.created_at.isoformat()
-    } for reward in rewards])
+    """Get the current user's rewards, newest first, one keyset page at a time"""
+    limit, cursor = page_args()
+    keys = (Reward.created_at, Reward.id)
+    try:
+        serializer, criteria = list_projection(reward_serializer, keys)
+        rewards, next_cursor = keyset_page(
+            serializer.query(Reward.user_id == current_user.id, *criteria),
+            keys, limit, cursor, descending=True
+        )
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': serializer.dump_rows(rewards), 'next_cursor': next_cursor})
 
 @rewards_bp.route('/api/rewards/available', methods=['GET'])
 @login_required
 def get_available_rewards():
     """Get available (unlocked but unused) rewards"""
-    rewards = Reward.query.filter_by(
-        user_id=current_user.id,
-        is_used=False
-    ).filter(
+    rewards = available_serializer.query(
+        Reward.user_id == current_user.id,
+        Reward.is_used == False,
         (Reward.expires_at.is_(None)) | (Reward.expires_at > datetime.utcnow())
     ).all()
     
-    return jsonify([{
-        'id': reward.id,
-        'reward_type': reward.reward_type,
-        'reward_value': reward.reward_value,
-        'description': reward.description,
-        'expires_at': reward.expires_at.isoformat() if reward.expires_at else None
-    } for reward in rewards])
+    return jsonify(available_serializer.dump_rows(rewards))
 
 @rewards_bp.route('/api/rewards/check-eligibility', methods=['GET'])
 @login_required
 def check_reward_eligibility():
     """Check what rewards the user is eligible for based on their activity"""
-    streak = Streak.query.filter_by(user_id=current_user.id).first()
-    
-    if not streak:
-        return jsonify({'eligible_rewards': []})
-    
-    eligible_rewards = []
-    
-    # Check for streak-based rewards
-    if streak.current_streak >= 7 and streak.current_streak < 14:
-        eligible_rewards.append({
-            'type': 'discount',
-            'value': 10.0,
-            'description': '7-day streak discount: 10% off next subscription',
-            'requirement': '7-day study streak'
-        })
-    elif streak.current_streak >= 14 and streak.current_streak < 20:
-        eligible_rewards.append({
-            'type': 'discount',
-            'value': 15.0,
-            'description': '14-day streak discount: 15% off next subscription',
-            'requirement': '14-day study streak'
-        })
-    elif streak.current_streak >= 20:
-        eligible_rewards.append({
-            'type': 'feature_unlock',
-            'value': 100.0,
-            'description': '20-day streak: Unlock study groups feature',
-            'requirement': '20-day study streak'
-        })
-        eligible_rewards.append({
-            'type': 'discount',
-            'value': 25.0,
-            'description': '20-day streak discount: 25% off next subscription',
-            'requirement': '20-day study streak'
-        })
+    eligible_rewards = [{
+        'code': rule.code,
+        'type': rule.reward_type,
+        'value': float(rule.reward_value) if rule.reward_value is not None else None,
+        'description': rule.description,
+        'requirement': rule.requirement,
+        'unlocked': reward_id is not None
+    } for _, rule, reward_id in earned_rules([current_user.id])]
     
     return jsonify({'eligible_rewards': eligible_rewards})
 
@@ -116,15 +131,9 @@ def unlock_reward():
     db.session.add(new_reward)
     db.session.commit()
     
-    return jsonify({
-        'id': new_reward.id,
-        'reward_type': new_reward.reward_type,
-        'reward_value': new_reward.reward_value,
-        'description': new_reward.description,
-        'unlocked_at': new_reward.unlocked_at.isoformat(),
-        'expires_at': new_reward.expires_at.isoformat() if new_reward.expires_at else None,
-        'message': 'Reward unlocked successfully!'
-    }), 201
+    payload = reward_serializer.dump(new_reward)
+    payload['message'] = 'Reward unlocked successfully!'
+    return jsonify(payload), 201
 
 @rewards_bp.route('/api/rewards/<int:reward_id>/redeem', methods=['POST'])
 @login_required
@@ -152,127 +161,22 @@ def redeem_reward(reward_id):
 @login_required
 def auto_check_rewards():
     """Automatically check and unlock rewards based on user's current achievements"""
-    streak = Streak.query.filter_by(user_id=current_user.id).first()
-    
-    if not streak:
-        return jsonify({'message': 'No streak data found', 'rewards_unlocked': 0})
-    
-    rewards_unlocked = 0
-    
-    # Check for 7-day streak reward
-    if streak.current_streak >= 7:
-        reward = Reward.query.filter_by(
-            user_id=current_user.id,
-            reward_type='discount',
-            reward_value=10.0,
-            description__contains='7-day streak'
-        ).first()
-        
-        if not reward:
-            new_reward = Reward(
-                user_id=current_user.id,
-                reward_type='discount',
-                reward_value=10.0,
-                description='7-day streak discount: 10% off next subscription',
-                unlocked_at=datetime.utcnow(),
-                expires_at=datetime.utcnow() + timedelta(days=30)
-            )
-            db.session.add(new_reward)
-            rewards_unlocked += 1
-    
-    # Check for 14-day streak reward
-    if streak.current_streak >= 14:
-        reward = Reward.query.filter_by(
-            user_id=current_user.id,
-            reward_type='discount',
-            reward_value=15.0,
-            description__contains='14-day streak'
-        ).first()
-        
-        if not reward:
-            new_reward = Reward(
-                user_id=current_user.id,
-                reward_type='discount',
-                reward_value=15.0,
-                description='14-day streak discount: 15% off next subscription',
-                unlocked_at=datetime.utcnow(),
-                expires_at=datetime.utcnow() + timedelta(days=30)
-            )
-            db.session.add(new_reward)
-            rewards_unlocked += 1
-    
-    # Check for 20-day streak rewards
-    if streak.current_streak >= 20:
-        # Group unlock reward
-        group_reward = Reward.query.filter_by(
-            user_id=current_user.id,
-            reward_type='feature_unlock',
-            reward_value=100.0,
-            description__contains='study groups'
-        ).first()
-        
-        if not group_reward:
-            new_reward = Reward(
-                user_id=current_user.id,
-                reward_type='feature_unlock',
-                reward_value=100.0,
-                description='20-day streak: Unlock study groups feature',
-                unlocked_at=datetime.utcnow()
-            )
-            db.session.add(new_reward)
-            rewards_unlocked += 1
-        
-        # 25% discount reward
-        discount_reward = Reward.query.filter_by(
-            user_id=current_user.id,
-            reward_type='discount',
-            reward_value=25.0,
-            description__contains='20-day streak'
-        ).first()
-        
-        if not discount_reward:
-            new_reward = Reward(
-                user_id=current_user.id,
-                reward_type='discount',
-                reward_value=25.0,
-                description='20-day streak discount: 25% off next subscription',
-                unlocked_at=datetime.utcnow(),
-                expires_at=datetime.utcnow() + timedelta(days=30)
-            )
-            db.session.add(new_reward)
-            rewards_unlocked += 1
-    
+    unlocked = unlock_earned([current_user.id])
     db.session.commit()
     
     return jsonify({
-        'message': f'Unlocked {rewards_unlocked} new rewards!',
-        'rewards_unlocked': rewards_unlocked
+        'message': f'Unlocked {len(unlocked)} new rewards!',
+        'rewards_unlocked': len(unlocked),
+        'unlocked': [rule_code for _, rule_code in unlocked]
     })
 
 @rewards_bp.route('/api/rewards/statistics', methods=['GET'])
 @login_required
 def get_reward_statistics():
     """Get reward statistics for the user"""
-    total_rewards = Reward.query.filter_by(user_id=current_user.id).count()
-    used_rewards = Reward.query.filter_by(user_id=current_user.id, is_used=True).count()
-    available_rewards = Reward.query.filter_by(user_id=current_user.id, is_used=False).count()
+    stats = reward_stats_cache.get(current_user.id)
+    if stats is None:
+        stats = build_reward_statistics(current_user.id)
+        reward_stats_cache.set(current_user.id, stats)
     
-    # Calculate total discount value
-    discount_rewards = Reward.query.filter_by(
-        user_id=current_user.id,
-        reward_type='discount'
-    ).all()
-    
-    total_discount_value = sum(reward.reward_value for reward in discount_rewards)
-    
-    return jsonify({
-        'total_rewards': total_rewards,
-        'used_rewards': used_rewards,
-        'available_rewards': available_rewards,
-        'total_discount_value': total_discount_value,
-        'rewards_by_type': {
-            'discount': len([r for r in discount_rewards if r.reward_type == 'discount']),
-            'feature_unlock': len([r for r in discount_rewards if r.reward_type == 'feature_unlock']),
-            'badge': len([r for r in discount_rewards if r.reward_type == 'badge'])
-        }
-    }) 
\ No newline at end of file
+    return jsonify(stats)
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, func, select, true
+from app.cache import record_write
+from app.models.schema import db, DailyUserStat, Reward, RewardRule, Streak, User
+from app.upsert import insert_for
+
+# The catalog shipped with the app; database_schema.sql seeds the same rows
+DEFAULT_RULES = [
+    dict(code='streak_7_discount', metric='current_streak', threshold=7, reward_type='discount',
+         reward_value=10.0, description='7-day streak discount: 10% off next subscription',
+         requirement='7-day study streak', expires_after_days=30),
+    dict(code='streak_14_discount', metric='current_streak', threshold=14, reward_type='discount',
+         reward_value=15.0, description='14-day streak discount: 15% off next subscription',
+         requirement='14-day study streak', expires_after_days=30),
+    dict(code='streak_20_groups', metric='current_streak', threshold=20, reward_type='feature_unlock',
+         reward_value=100.0, description='20-day streak: Unlock study groups feature',
+         requirement='20-day study streak', expires_after_days=None),
+    dict(code='streak_20_discount', metric='current_streak', threshold=20, reward_type='discount',
+         reward_value=25.0, description='20-day streak discount: 25% off next subscription',
+         requirement='20-day study streak', expires_after_days=30),
+]
+
+
+def _metrics(user_ids):
+    """SQL expressions for each metric a rule can test, and the rollup subquery they need"""
+    totals = select(
+        DailyUserStat.user_id,
+        func.sum(DailyUserStat.study_minutes).label('study_minutes'),
+        func.sum(DailyUserStat.session_count).label('session_count'),
+        func.sum(DailyUserStat.tasks_completed).label('tasks_completed')
+    ).where(DailyUserStat.user_id.in_(user_ids)).group_by(DailyUserStat.user_id).subquery()
+    metrics = {
+        'current_streak': func.coalesce(Streak.current_streak, 0),
+        'longest_streak': func.coalesce(Streak.longest_streak, 0),
+        'study_minutes': func.coalesce(totals.c.study_minutes, 0),
+        'session_count': func.coalesce(totals.c.session_count, 0),
+        'tasks_completed': func.coalesce(totals.c.tasks_completed, 0)
+    }
+    return metrics, totals
+
+
+def earned_rules(user_ids):
+    """(user_id, rule, reward_id) for every active rule each user currently meets.
+
+    One query tests every rule against every user's streak and rollup
+    totals; ``reward_id`` is the reward already granted for the rule, or
+    None if it is still to be unlocked.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    metrics, totals = _metrics(user_ids)
+    value = case(metrics, value=RewardRule.metric, else_=None)
+    return db.session.query(User.id, RewardRule, Reward.id).select_from(User).join(
+        RewardRule, true()
+    ).outerjoin(
+        Streak, and_(Streak.user_id == User.id, Streak.streak_type == 'daily')
+    ).outerjoin(
+        totals, totals.c.user_id == User.id
+    ).outerjoin(
+        Reward, and_(Reward.user_id == User.id, Reward.rule_code == RewardRule.code)
+    ).filter(
+        User.id.in_(user_ids),
+        RewardRule.active.is_(True),
+        value >= RewardRule.threshold
+    ).order_by(User.id, RewardRule.threshold, RewardRule.code).all()
+
+
+def unlock_earned(user_ids, now=None):
+    """Grant every earned, not yet granted reward to ``user_ids`` in one INSERT.
+
+    Rows that another writer granted in the meantime are skipped by ON
+    CONFLICT DO NOTHING on (user_id, rule_code), so this is safe to run
+    concurrently and repeatedly. Returns the (user_id, rule_code) pairs
+    actually inserted. Runs in the caller's transaction.
+    """
+    now = now or datetime.utcnow()
+    rows = [
+        dict(
+            user_id=user_id, rule_code=rule.code, reward_type=rule.reward_type,
+            reward_value=rule.reward_value, description=rule.description, unlocked_at=now,
+            expires_at=now + timedelta(days=rule.expires_after_days) if rule.expires_after_days else None,
+            is_used=False, extra_data={}, created_at=now
+        )
+        for user_id, rule, reward_id in earned_rules(user_ids) if reward_id is None
+    ]
+    if not rows:
+        return []
+    table = Reward.__table__
+    insert = insert_for(db.session.get_bind())(table).values(rows)
+    unlocked = db.session.execute(
+        insert.on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.rule_code])
+        .returning(table.c.user_id, table.c.rule_code)
+    ).all()
+    for user_id in {user_id for user_id, _ in unlocked}:
+        record_write(db.session, Reward, user_id=user_id)
+    return unlocked
+
+
+def seed_reward_rules():
+    """Add any DEFAULT_RULES missing from the catalog; existing rows are left as edited"""
+    table = RewardRule.__table__
+    insert = insert_for(db.session.get_bind())(table).values(DEFAULT_RULES)
+    added = db.session.execute(insert.on_conflict_do_nothing(index_elements=[table.c.code])).rowcount
+    db.session.commit()
+    return added
+
+
+def backfill_rule_codes():
+    """Tag rewards granted before the catalog existed with their rule (one-off).
+
+    Old grants are matched on type and description; a user's earliest
+    match per rule is tagged, so the engine won't grant it again.
+    """
+    updated = 0
+    for rule in RewardRule.query.all():
+        matching = and_(
+            Reward.rule_code.is_(None),
+            Reward.reward_type == rule.reward_type,
+            Reward.description == rule.description
+        )
+        earliest = select(func.min(Reward.id)).where(matching).group_by(Reward.user_id)
+        tagged = select(Reward.user_id).where(Reward.rule_code == rule.code)
+        updated += Reward.query.filter(
+            Reward.id.in_(earliest.scalar_subquery()),
+            Reward.user_id.notin_(tagged.scalar_subquery())
+        ).update({'rule_code': rule.code}, synchronize_session=False)
+    db.session.commit()
+    return updated
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.cache import DEFER_COMMIT_HOOKS
+from app.models.schema import db
+from app.rewards.rules import unlock_earned
+
+_PENDING_KEY = 'reward_checks'
+
+# Redis keys shared by every web process and Celery worker
+REDIS_PENDING = 'reward_checks:pending'
+REDIS_SCHEDULED = 'reward_checks:scheduled'
+
+# Set by init_reward_worker: the queue triggers are handed to, and the
+# Celery app (for ``celery -A celery_worker.celery worker``) when configured
+queue = None
+celery = None
+
+_listeners_installed = False
+
+
+def queue_reward_check(user_id):
+    """Evaluate the user's rewards in the background once this transaction commits"""
+    db.session.info.setdefault(_PENDING_KEY, set()).add(user_id)
+
+
+def evaluate_rewards(app, user_ids, batch_size):
+    """Run the rules engine for ``user_ids``, one transaction per batch"""
+    user_ids = sorted(user_ids)
+    with app.app_context():
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            try:
+                unlocked = unlock_earned(batch)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Reward evaluation failed for %d users', len(batch))
+                continue
+            if unlocked:
+                app.logger.info('Unlocked %d rewards for %d users', len(unlocked), len(batch))
+
+
+class ThreadQueue:
+    """In-process stand-in for Celery: one daemon thread per process.
+
+    The thread waits ``delay`` seconds after the first trigger, then
+    evaluates every user queued meanwhile, so a burst of triggers for a
+    user costs one evaluation. Pending users are lost if the process
+    exits; the next trigger or ``flask unlock-rewards`` catches them up.
+    """
+
+    def __init__(self, app, delay=1.0, batch_size=500):
+        self.app = app
+        self.delay = delay
+        self.batch_size = batch_size
+        self._pending = set()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, user_ids):
+        with self._wakeup:
+            self._pending.update(user_ids)
+            # Threads don't survive a fork, so each gunicorn worker starts its own
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='reward-checks', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    self._wakeup.wait()
+            time.sleep(self.delay)
+            with self._wakeup:
+                user_ids, self._pending = self._pending, set()
+            evaluate_rewards(self.app, user_ids, self.batch_size)
+
+
+class CeleryQueue:
+    """Coalesces triggers in a Redis set and evaluates them on a Celery worker.
+
+    The first trigger in a quiet period schedules one task ``delay``
+    seconds out (guarded by a SET NX flag); triggers arriving before it
+    runs just join the set. The flag expires on its own in case a task
+    is lost.
+    """
+
+    def __init__(self, app, broker_url, delay=1.0, batch_size=500):
+        import redis
+        from celery import Celery
+
+        self.delay = delay
+        self.redis = redis.Redis.from_url(broker_url)
+        self.celery = Celery(app.import_name, broker=broker_url)
+        self.celery.conf.task_ignore_result = True
+
+        @self.celery.task(name='rewards.evaluate_pending')
+        def evaluate_pending():
+            self.redis.delete(REDIS_SCHEDULED)
+            while True:
+                user_ids = self.redis.spop(REDIS_PENDING, batch_size)
+                if not user_ids:
+                    break
+                evaluate_rewards(app, [int(user_id) for user_id in user_ids], batch_size)
+
+        self.task = evaluate_pending
+
+    def submit(self, user_ids):
+        pipe = self.redis.pipeline()
+        pipe.sadd(REDIS_PENDING, *user_ids)
+        pipe.set(REDIS_SCHEDULED, 1, nx=True, ex=60)
+        _, scheduled = pipe.execute()
+        if scheduled:
+            self.task.apply_async(countdown=self.delay)
+
+
+def init_reward_worker(app):
+    """Pick the queue from config and hand it each committed transaction's triggers"""
+    global queue, celery, _listeners_installed
+    delay = app.config.get('REWARD_CHECK_DELAY_SECONDS', 1.0)
+    batch_size = app.config.get('REWARD_CHECK_BATCH_SIZE', 500)
+    broker_url = app.config.get('CELERY_BROKER_URL')
+    if broker_url:
+        queue = CeleryQueue(app, broker_url, delay, batch_size)
+        celery = queue.celery
+    else:
+        queue = ThreadQueue(app, delay, batch_size)
+
+    if _listeners_installed:
+        return
+
+    def dispatch_committed(session):
+        if session.info.get(DEFER_COMMIT_HOOKS):
+            return
+        user_ids = session.info.pop(_PENDING_KEY, None)
+        if not user_ids:
+            return
+        # The transaction already committed; a queue outage must not fail the request
+        try:
+            queue.submit(user_ids)
+        except Exception:
+            app.logger.exception('Could not queue reward checks')
+
+    def discard_pending(session):
+        if not session.info.get(DEFER_COMMIT_HOOKS):
+            session.info.pop(_PENDING_KEY, None)
+
+    event.listen(Session, 'after_commit', dispatch_committed)
+    event.listen(Session, 'after_rollback', discard_pending)
+    _listeners_installed = True
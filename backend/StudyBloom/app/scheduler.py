@@ -0,0 +1,48 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+
+scheduler = None
+
+
+def init_scheduler(app):
+    """Start in-process periodic jobs (streak rollover, focus downsampling,
+    closing stale sessions) when SCHEDULER_ENABLED is set.
+
+    Jobs are written to be safe when several workers or nodes run them
+    at the same time, so no leader election is needed.
+    """
+    global scheduler
+    if not app.config.get('SCHEDULER_ENABLED') or scheduler is not None:
+        return
+
+    def rollover():
+        from app.streaks.rollover import rollover_streaks
+        with app.app_context():
+            reset, elapsed = rollover_streaks(batch_size=app.config['STREAK_ROLLOVER_BATCH_SIZE'])
+            app.logger.info('Streak rollover reset %d streaks in %.2fs', reset, elapsed)
+
+    scheduler = BackgroundScheduler(daemon=True)
+    # Some timezone reaches midnight every 15 minutes, so this runs far more than nightly
+    scheduler.add_job(
+        rollover, 'interval', id='streak_rollover',
+        minutes=app.config['STREAK_ROLLOVER_INTERVAL_MINUTES'],
+        max_instances=1, coalesce=True
+    )
+    def downsample_focus():
+        from app.focus.samples import downsample_samples
+        with app.app_context():
+            folded = downsample_samples(app.config['FOCUS_RAW_RETENTION_HOURS'])
+            app.logger.info('Focus downsampling folded %d samples', folded)
+
+    scheduler.add_job(downsample_focus, 'interval', id='focus_downsample', hours=1, max_instances=1, coalesce=True)
+
+    def close_stale():
+        from app.streaks.stale import close_stale_sessions
+        with app.app_context():
+            closed, elapsed = close_stale_sessions(
+                stale_after_hours=app.config['STALE_SESSION_HOURS'],
+                batch_size=app.config['STALE_SESSION_BATCH_SIZE']
+            )
+            app.logger.info('Closed %d stale study sessions in %.2fs', closed, elapsed)
+
+    scheduler.add_job(close_stale, 'interval', id='close_stale_sessions', minutes=30, max_instances=1, coalesce=True)
+    scheduler.start()
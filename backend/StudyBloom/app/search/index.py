@@ -0,0 +1,154 @@
+import re
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app.models.schema import db, Goal, Task, StudySession
+
+# Entity type -> (model, title column, searchable columns). The Postgres
+# expression below must match the GIN indexes in schema.py / database_schema.sql
+# character for character, otherwise the planner won't use them.
+SEARCHABLE = {
+    'tasks': (Task, 'title', ('title', 'description')),
+    'goals': (Goal, 'title', ('title', 'description')),
+    'study_sessions': (StudySession, 'subject', ('subject', 'notes'))
+}
+
+MAX_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+_FTS_DDL = text("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        entity_type UNINDEXED, entity_id UNINDEXED, user_id UNINDEXED, title, body,
+        tokenize = 'porter unicode61'
+    )
+""")
+
+_listeners_installed = False
+
+
+def document_sql(columns):
+    """SQL text concatenating ``columns`` into one searchable document"""
+    return " || ' ' || ".join(f"coalesce({name}, '')" for name in columns)
+
+
+def search_terms(q):
+    """Word tokens of the user's query; punctuation and operators are dropped"""
+    return _TERM.findall(q.lower())[:MAX_TERMS]
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def search(user_id, q, types, limit):
+    """Ranked matches for ``q`` as (entity_type, id, title, rank), best first.
+
+    Every term is a prefix match, and all terms must match.
+    """
+    terms = search_terms(q)
+    if not terms or not types:
+        return []
+    if _dialect() == 'sqlite':
+        return _search_fts5(user_id, terms, types, limit)
+    return _search_postgres(user_id, terms, types, limit)
+
+
+def _search_postgres(user_id, terms, types, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    selects = []
+    for entity_type in types:
+        model, title, columns = SEARCHABLE[entity_type]
+        vector = f"to_tsvector('english', {document_sql(columns)})"
+        selects.append(f"""
+            SELECT '{entity_type}' AS entity_type, id, {title} AS title,
+                   ts_rank({vector}, query) AS rank
+            FROM {model.__tablename__}, to_tsquery('english', :q) AS query
+            WHERE user_id = :user_id AND {vector} @@ query
+        """)
+    sql = ' UNION ALL '.join(selects) + ' ORDER BY rank DESC, id DESC LIMIT :limit'
+    rows = db.session.execute(text(sql), {'q': tsquery, 'user_id': user_id, 'limit': limit})
+    return [tuple(row) for row in rows]
+
+
+def _search_fts5(user_id, terms, types, limit):
+    ensure_fts_table(db.session.connection())
+    match = ' AND '.join(f'"{term}"*' for term in terms)
+    placeholders = ', '.join(f':type{i}' for i in range(len(types)))
+    params = {f'type{i}': entity_type for i, entity_type in enumerate(types)}
+    params.update({'q': match, 'user_id': user_id, 'limit': limit})
+    # bm25() is lower-is-better; negate it so both backends rank descending
+    rows = db.session.execute(text(f"""
+        SELECT entity_type, entity_id, title, -bm25(search_index) AS rank
+        FROM search_index
+        WHERE search_index MATCH :q AND user_id = :user_id
+          AND entity_type IN ({placeholders})
+        ORDER BY rank DESC, entity_id DESC
+        LIMIT :limit
+    """), params)
+    return [tuple(row) for row in rows]
+
+
+def ensure_fts_table(connection):
+    connection.execute(_FTS_DDL)
+
+
+def _fts_delete(connection, entity_type, entity_id):
+    connection.execute(text(
+        'DELETE FROM search_index WHERE entity_type = :type AND entity_id = :id'
+    ), {'type': entity_type, 'id': entity_id})
+
+
+def _fts_insert(connection, entity_type, obj, title, columns):
+    connection.execute(text("""
+        INSERT INTO search_index (entity_type, entity_id, user_id, title, body)
+        VALUES (:type, :id, :user_id, :title, :body)
+    """), {
+        'type': entity_type,
+        'id': obj.id,
+        'user_id': obj.user_id,
+        'title': getattr(obj, title),
+        'body': ' '.join(getattr(obj, name) or '' for name in columns)
+    })
+
+
+def _sync_fts(session, flush_context):
+    """Mirror flushed searchable rows into the SQLite FTS5 table"""
+    changed = [obj for obj in session.new | session.dirty | session.deleted
+               if isinstance(obj, (Task, Goal, StudySession))]
+    if not changed:
+        return
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+
+    ensure_fts_table(connection)
+    for entity_type, (model, title, columns) in SEARCHABLE.items():
+        for obj in changed:
+            if not isinstance(obj, model):
+                continue
+            _fts_delete(connection, entity_type, obj.id)
+            if obj not in session.deleted:
+                _fts_insert(connection, entity_type, obj, title, columns)
+
+
+def rebuild_fts_index():
+    """Refill the SQLite FTS5 table from scratch; returns rows indexed"""
+    connection = db.session.connection()
+    ensure_fts_table(connection)
+    connection.execute(text('DELETE FROM search_index'))
+    indexed = 0
+    for entity_type, (model, title, columns) in SEARCHABLE.items():
+        for obj in model.query.yield_per(500):
+            _fts_insert(connection, entity_type, obj, title, columns)
+            indexed += 1
+    db.session.commit()
+    return indexed
+
+
+def init_search():
+    """Keep the SQLite fallback index current. Postgres needs no upkeep:
+    its GIN indexes are on expressions, so they follow every write."""
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Session, 'after_flush', _sync_fts)
+        _listeners_installed = True
@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from app.search.index import SEARCHABLE, search
+
+search_bp = Blueprint('search', __name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 50
+
+@search_bp.route('/api/search', methods=['GET'])
+@login_required
+def search_everything():
+    """Ranked prefix search over the user's tasks, goals and study-session notes"""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    
+    raw_types = request.args.get('types')
+    types = [name for name in raw_types.split(',') if name] if raw_types else list(SEARCHABLE)
+    unknown = set(types) - set(SEARCHABLE)
+    if unknown:
+        return jsonify({'error': 'Unknown types: ' + ', '.join(sorted(unknown))}), 400
+    
+    limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+    results = search(current_user.id, q, types, limit)
+    
+    return jsonify({
+        'query': q,
+        'results': [
+            {'type': entity_type, 'id': entity_id, 'title': title, 'rank': round(float(rank), 4)}
+            for entity_type, entity_id, title, rank in results
+        ]
+    })
@@ -0,0 +1,127 @@
+from datetime import date, datetime
+from flask import request
+from sqlalchemy import ARRAY
+from app.models.schema import db, Goal, Task, StudySession, Reminder, Reward, Streak
+
+MAX_IDS = 100
+
+
+class InvalidProjection(ValueError):
+    pass
+
+
+class Serializer:
+    """Declares a resource's public fields once.
+
+    ``query`` selects just those columns as lightweight row tuples (no
+    identity map), and ``dump_rows`` turns a whole result set into dicts
+    column by column so temporal values are formatted in a single pass.
+    """
+
+    def __init__(self, model, *fields):
+        self.model = model
+        self.fields = fields
+        self.columns = [getattr(model, name) for name in fields]
+        self._temporal = []
+        self._arrays = []
+        for i, column in enumerate(self.columns):
+            if isinstance(column.type, ARRAY):
+                self._arrays.append(i)
+            elif column.type.python_type in (datetime, date):
+                self._temporal.append(i)
+
+    def only(self, *fields):
+        """A serializer for a subset of this one's fields"""
+        return Serializer(self.model, *[name for name in self.fields if name in fields])
+
+    def labelled(self, prefix):
+        """This serializer's columns labelled for use alongside another entity's"""
+        return [column.label(prefix + name) for name, column in zip(self.fields, self.columns)]
+
+    def query(self, *criteria):
+        return db.session.query(*self.columns).filter(*criteria)
+
+    def dump_rows(self, rows):
+        """Dicts for the leading ``len(fields)`` columns of each row"""
+        if not rows:
+            return []
+        columns = list(zip(*rows))[:len(self.fields)]
+        for i in self._temporal:
+            columns[i] = [value.isoformat() if value is not None else None for value in columns[i]]
+        for i in self._arrays:
+            columns[i] = [value or [] for value in columns[i]]
+        return [dict(zip(self.fields, values)) for values in zip(*columns)]
+
+    def dump(self, obj):
+        """Serialize a single ORM instance (e.g. right after create/update)"""
+        return self.dump_rows([tuple(getattr(obj, name) for name in self.fields)])[0]
+
+
+def list_projection(serializer, keys):
+    """Apply ?fields= and ?ids= to a list endpoint.
+
+    Returns the narrowed serializer and extra filter criteria. The sort
+    key columns in ``keys`` are always selected so keyset pagination
+    keeps working.
+    """
+    raw_fields = request.args.get('fields')
+    if raw_fields:
+        requested = {name.strip() for name in raw_fields.split(',') if name.strip()}
+        unknown = requested - set(serializer.fields)
+        if unknown:
+            raise InvalidProjection('Unknown fields: ' + ', '.join(sorted(unknown)))
+        serializer = serializer.only(*requested, *(column.key for column in keys))
+
+    criteria = []
+    raw_ids = request.args.get('ids')
+    if raw_ids:
+        try:
+            ids = {int(value) for value in raw_ids.split(',') if value.strip()}
+        except ValueError:
+            raise InvalidProjection('ids must be comma-separated integers')
+        if len(ids) > MAX_IDS:
+            raise InvalidProjection(f'At most {MAX_IDS} ids per request')
+        criteria.append(serializer.model.id.in_(ids))
+
+    return serializer, criteria
+
+
+goal_serializer = Serializer(
+    Goal,
+    'id', 'title', 'description', 'deadline', 'completed', 'completion_percentage',
+    'target_minutes', 'completed_minutes', 'category', 'priority', 'color', 'icon',
+    'created_at', 'updated_at'
+)
+
+# Compact goal embedded in tasks by ?include=goal
+embedded_goal_serializer = goal_serializer.only('id', 'title', 'color', 'icon')
+
+task_serializer = Serializer(
+    Task,
+    'id', 'goal_id', 'title', 'description', 'status', 'priority', 'due_date',
+    'estimated_minutes', 'actual_minutes', 'completed_at', 'position', 'tags',
+    'created_at', 'updated_at'
+)
+
+study_session_serializer = Serializer(
+    StudySession,
+    'id', 'goal_id', 'start_time', 'end_time', 'duration_minutes', 'subject', 'notes', 'tags',
+    'created_at'
+)
+
+reminder_serializer = Serializer(
+    Reminder,
+    'id', 'task_id', 'title', 'message', 'reminder_time', 'status',
+    'notification_type', 'created_at'
+)
+
+reward_serializer = Serializer(
+    Reward,
+    'id', 'reward_type', 'reward_value', 'description', 'unlocked_at', 'expires_at',
+    'is_used', 'created_at'
+)
+
+streak_serializer = Serializer(
+    Streak,
+    'current_streak', 'longest_streak', 'last_activity_date', 'streak_type'
+)
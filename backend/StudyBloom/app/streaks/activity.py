@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, union_all
+from app.models.schema import db, ActivityBitmap, StudySession, Task, User
+from app.timezones import local_date
+from app.upsert import insert_for
+
+# Bit i of a user's bitmap is set when they were active on local day EPOCH + i.
+# Stored little-endian, so a year of history costs ~46 bytes.
+EPOCH = date(2020, 1, 1)
+
+
+def day_index(day):
+    return (day - EPOCH).days
+
+
+def index_day(index):
+    return EPOCH + timedelta(days=index)
+
+
+def to_bits(raw):
+    return int.from_bytes(raw or b'', 'little')
+
+
+def from_bits(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def window(bits, start, end):
+    """Bits for the days start..end inclusive, re-based so bit 0 is ``start``"""
+    first = max(day_index(start), 0)
+    last = day_index(end)
+    if last < first:
+        return 0
+    return (bits >> first) & ((1 << (last - first + 1)) - 1)
+
+
+def count_days(bits):
+    return bin(bits).count('1')
+
+
+def longest_run(bits):
+    """Longest run of consecutive set bits (x &= x << 1 strips one day per round)"""
+    run = 0
+    while bits:
+        bits &= bits << 1
+        run += 1
+    return run
+
+
+def run_ending(bits, day):
+    """Consecutive active days ending on ``day`` (0 if ``day`` itself was idle)"""
+    index = day_index(day)
+    if index < 0:
+        return 0
+    gaps = ~bits & ((1 << (index + 1)) - 1)
+    if not gaps:
+        return index + 1
+    return index - (gaps.bit_length() - 1)
+
+
+def current_run(bits, today):
+    """The live streak: today's run, or yesterday's if today has no activity yet"""
+    return run_ending(bits, today) or run_ending(bits, today - timedelta(days=1))
+
+
+def active_dates(bits, start):
+    """Dates of the set bits of a ``window()`` that begins on ``start``"""
+    days = []
+    offset = 0
+    while bits:
+        if bits & 1:
+            days.append(start + timedelta(days=offset))
+        bits >>= 1
+        offset += 1
+    return days
+
+
+def load_bits(user_id):
+    raw = db.session.query(ActivityBitmap.bits).filter_by(user_id=user_id).scalar()
+    return to_bits(raw)
+
+
+def mark_active(user_id, day):
+    """Set ``day``'s bit for the user inside the caller's transaction.
+
+    The row is created with INSERT ... ON CONFLICT DO NOTHING and then
+    re-read FOR UPDATE, so a user's first two activities racing each
+    other serialize on the row instead of one failing on the primary key.
+    """
+    index = day_index(day)
+    if index < 0:
+        return
+    table = ActivityBitmap.__table__
+    db.session.execute(
+        insert_for(db.session.get_bind())(table).values(
+            user_id=user_id, bits=b'', updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=[table.c.user_id])
+    )
+    bitmap = ActivityBitmap.query.filter_by(user_id=user_id).with_for_update().populate_existing().one()
+    bits = to_bits(bitmap.bits)
+    if bits >> index & 1:
+        return
+    bitmap.bits = from_bits(bits | 1 << index)
+    bitmap.updated_at = datetime.utcnow()
+
+
+def rebuild_bitmaps(batch_size=1000):
+    """Rebuild every user's bitmap from session and task history in one pass.
+
+    One streaming query feeds (user, timezone, timestamp) rows; each is
+    mapped to the user's local day and OR-ed into a Python int, and the
+    results are written back with batched upserts.
+    """
+    activity = union_all(
+        select(StudySession.user_id, StudySession.end_time.label('at'))
+        .where(StudySession.end_time.isnot(None)),
+        select(Task.user_id, Task.completed_at.label('at'))
+        .where(Task.completed_at.isnot(None))
+    ).subquery()
+    rows = db.session.execute(
+        select(activity.c.user_id, User.timezone, activity.c.at)
+        .join(User, User.id == activity.c.user_id)
+        .execution_options(yield_per=5000)
+    )
+    bitmaps = defaultdict(int)
+    for user_id, tz_name, at in rows:
+        index = day_index(local_date(tz_name, at))
+        if index >= 0:
+            bitmaps[user_id] |= 1 << index
+
+    table = ActivityBitmap.__table__
+    insert = insert_for(db.session.get_bind())(table)
+    statement = insert.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={'bits': insert.excluded.bits, 'updated_at': insert.excluded.updated_at}
+    )
+    now = datetime.utcnow()
+    rows = [{'user_id': user_id, 'bits': from_bits(bits), 'updated_at': now}
+            for user_id, bits in bitmaps.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(statement, rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
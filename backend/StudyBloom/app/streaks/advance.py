@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from sqlalchemy import case
+from app.cache import record_write
+from app.models.schema import db, Streak
+from app.streaks.activity import mark_active
+from app.timezones import local_today, day_end_utc
+from app.upsert import insert_for
+
+
+def advance_streak(user_id, tz_name):
+    """Record today's activity and advance the user's daily streak.
+
+    The streak row is created or advanced by one INSERT ... ON CONFLICT
+    DO UPDATE ... RETURNING, so concurrent calls (two devices ending
+    sessions at once) serialize on the row instead of losing updates.
+    Runs in the caller's transaction.
+
+    Returns (current_streak, longest_streak, advanced); ``advanced`` is
+    False when the user had already been active today.
+    """
+    now = datetime.utcnow()
+    today = local_today(tz_name, now)
+    yesterday = today - timedelta(days=1)
+    mark_active(user_id, today)
+
+    table = Streak.__table__
+    streaks = table.c
+    insert = insert_for(db.session.get_bind())(table).values(
+        user_id=user_id, streak_type='daily', current_streak=1, longest_streak=1,
+        last_activity_date=today, lapses_at=day_end_utc(tz_name, today + timedelta(days=1)),
+        total_days_active=1, created_at=now, updated_at=now
+    )
+    same_day = streaks.last_activity_date == today
+    current = case(
+        (same_day, streaks.current_streak),
+        (streaks.last_activity_date == yesterday, streaks.current_streak + 1),
+        else_=1
+    )
+    statement = insert.on_conflict_do_update(
+        index_elements=[streaks.user_id, streaks.streak_type],
+        set_={
+            'current_streak': current,
+            'longest_streak': case((current > streaks.longest_streak, current), else_=streaks.longest_streak),
+            'total_days_active': streaks.total_days_active + case((same_day, 0), else_=1),
+            'last_activity_date': today,
+            'lapses_at': insert.excluded.lapses_at,
+            # Left untouched on a repeat call so ETags and caches stay valid
+            'updated_at': case((same_day, streaks.updated_at), else_=now)
+        }
+    ).returning(streaks.current_streak, streaks.longest_streak, streaks.updated_at)
+
+    current_streak, longest_streak, updated_at = db.session.execute(statement).one()
+    advanced = updated_at == now
+    if advanced:
+        record_write(db.session, Streak, user_id=user_id)
+    return current_streak, longest_streak, advanced
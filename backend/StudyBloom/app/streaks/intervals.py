@@ -0,0 +1,151 @@
+from collections import defaultdict
+from sqlalchemy import Integer, case, cast, func, or_, select
+from app.models.schema import db, StudySession
+from app.timezones import day_end_utc, local_date
+
+
+def merge_intervals(intervals):
+    """Sweep ``(start, end)`` pairs in start order into sorted, disjoint intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def subtract_intervals(start, end, covered):
+    """Pieces of [start, end) outside the sorted, disjoint ``covered`` intervals"""
+    pieces = []
+    for covered_start, covered_end in covered:
+        if covered_end <= start:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > start:
+            pieces.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        pieces.append((start, end))
+    return pieces
+
+
+def split_by_day(start, end, tz_name):
+    """(local date, seconds) for each local day of ``tz_name`` that [start, end) touches"""
+    while start < end:
+        day = local_date(tz_name, start)
+        boundary = min(day_end_utc(tz_name, day), end)
+        yield day, (boundary - start).total_seconds()
+        start = boundary
+
+
+def floor_minute(value):
+    """Intervals are counted on a whole-minute grid.
+
+    Local midnights fall on whole minutes too, so every piece, day and
+    island is a whole number of minutes, and totals come out the same
+    however the time is split up (session by session or all at once).
+    """
+    return value.replace(second=0, microsecond=0)
+
+
+def whole_minutes(pieces):
+    return int(sum((end - start).total_seconds() for start, end in pieces) // 60)
+
+
+def _floor_minute_sql(column):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.strftime('%Y-%m-%d %H:%M:00', column)
+    return func.date_trunc('minute', column)
+
+
+def _minutes(start, end):
+    """Minutes between two timestamp expressions on the whole-minute grid"""
+    start, end = _floor_minute_sql(start), _floor_minute_sql(end)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return (cast(func.strftime('%s', end), Integer) - cast(func.strftime('%s', start), Integer)) / 60
+    return cast(func.extract('epoch', end - start), Integer) / 60
+
+
+def session_islands(*criteria, per_goal=False):
+    """Gaps-and-islands over ended sessions: one row per run of overlapping sessions.
+
+    A session opens a new island when it starts after every earlier
+    session of the same user (and goal, with ``per_goal``) has ended; a
+    running SUM of that flag numbers the islands. Everything happens in
+    SQL across all users at once. Selects user_id, goal_id (``per_goal``
+    only), start_time, end_time and minutes (see ``floor_minute``).
+    """
+    partition = [StudySession.user_id] + ([StudySession.goal_id] if per_goal else [])
+    reach = func.max(StudySession.end_time).over(
+        partition_by=partition, order_by=(StudySession.start_time, StudySession.id), rows=(None, -1)
+    )
+    flagged = select(
+        *partition, StudySession.id, StudySession.start_time, StudySession.end_time,
+        case((or_(reach.is_(None), StudySession.start_time > reach), 1), else_=0).label('opens')
+    ).where(
+        StudySession.end_time.isnot(None),
+        StudySession.end_time > StudySession.start_time,
+        *criteria
+    ).subquery()
+
+    keys = [flagged.c[column.key] for column in partition]
+    numbered = select(
+        *keys, flagged.c.start_time, flagged.c.end_time,
+        func.sum(flagged.c.opens).over(
+            partition_by=keys, order_by=(flagged.c.start_time, flagged.c.id), rows=(None, 0)
+        ).label('island')
+    ).subquery()
+
+    keys = [numbered.c[column.key] for column in partition]
+    start = func.min(numbered.c.start_time)
+    end = func.max(numbered.c.end_time)
+    return select(
+        *keys, start.label('start_time'), end.label('end_time'), _minutes(start, end).label('minutes')
+    ).group_by(*keys, numbered.c.island)
+
+
+def fresh_pieces(sessions):
+    """The parts of each session being ended that no other ended session covers.
+
+    Returns ``{session id: (pieces, goal_pieces)}``: the intervals a
+    session adds to its user's study time, and to its goal's. Sessions
+    ended together are counted in start order, so their overlaps with
+    each other count once too. One query fetches the overlapping history
+    for the whole batch.
+    """
+    if not sessions:
+        return {}
+    ids = [session.id for session in sessions]
+    history = db.session.query(
+        StudySession.user_id, StudySession.goal_id, StudySession.start_time, StudySession.end_time
+    ).filter(
+        StudySession.user_id.in_({session.user_id for session in sessions}),
+        StudySession.id.notin_(ids),
+        StudySession.end_time.isnot(None),
+        StudySession.start_time < max(session.end_time for session in sessions),
+        StudySession.end_time > min(session.start_time for session in sessions)
+    )
+
+    by_user = defaultdict(list)
+    by_goal = defaultdict(list)
+    for user_id, goal_id, start, end in history:
+        interval = (floor_minute(start), floor_minute(end))
+        by_user[user_id].append(interval)
+        if goal_id is not None:
+            by_goal[goal_id].append(interval)
+
+    fresh = {}
+    for session in sorted(sessions, key=lambda session: (session.start_time, session.id)):
+        interval = (floor_minute(session.start_time), floor_minute(session.end_time))
+        pieces = subtract_intervals(*interval, merge_intervals(by_user[session.user_id]))
+        goal_pieces = []
+        if session.goal_id is not None:
+            goal_pieces = subtract_intervals(*interval, merge_intervals(by_goal[session.goal_id]))
+            by_goal[session.goal_id].append(interval)
+        by_user[session.user_id].append(interval)
+        fresh[session.id] = (pieces, goal_pieces)
+    return fresh
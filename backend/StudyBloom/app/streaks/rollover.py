@@ -0,0 +1,61 @@
+from time import monotonic
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, select, update
+from app.cache import record_write
+from app.models.schema import db, Streak
+
+# Rows without lapses_at predate timezone-aware streaks. A streak lapses
+# when the local day after its last activity ends; in the westernmost zone
+# (UTC-12) that is two days after the activity date, plus 12 hours. 14
+# hours, the widest UTC offset, keeps every zone on the safe side.
+LEGACY_GRACE = timedelta(days=2, hours=14)
+
+
+def _lapsed(now):
+    return and_(Streak.lapses_at <= now, Streak.current_streak > 0)
+
+
+def _legacy_lapses_at():
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.datetime(Streak.last_activity_date, '+2 days', '+14 hours')
+    return Streak.last_activity_date + LEGACY_GRACE
+
+
+def backfill_lapses_at():
+    """Give pre-timezone streak rows a conservative lapses_at in one UPDATE (one-off)"""
+    updated = db.session.execute(
+        update(Streak).where(
+            Streak.lapses_at.is_(None),
+            Streak.last_activity_date.isnot(None)
+        ).values(lapses_at=_legacy_lapses_at()).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return updated
+
+
+def rollover_streaks(now=None, batch_size=5000):
+    """Zero every streak whose last local day has ended.
+
+    Works through the lapses_at index in batches of ``batch_size`` rows,
+    each a single UPDATE committed on its own. The batch is picked with
+    FOR UPDATE SKIP LOCKED, so several nodes can run this at once without
+    blocking or double-processing. Returns (rows reset, seconds taken).
+    """
+    now = now or datetime.utcnow()
+    started = monotonic()
+    total = 0
+    while True:
+        batch = select(Streak.id).where(_lapsed(now)).limit(batch_size).with_for_update(skip_locked=True)
+        user_ids = db.session.execute(
+            update(Streak).where(Streak.id.in_(batch.scalar_subquery()), _lapsed(now))
+            .values(current_streak=0, lapses_at=None, updated_at=now).returning(Streak.user_id)
+            .execution_options(synchronize_session=False, cache_keys_recorded=True)
+        ).scalars().all()
+        for user_id in set(user_ids):
+            record_write(db.session, Streak, user_id=user_id)
+        db.session.commit()
+        reset = len(user_ids)
+        total += reset
+        if reset < batch_size:
+            break
+    return total, monotonic() - started
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import func, select
+from app.cache import record_write
+from app.models.schema import db, DailyUserStat, StudySession, Task, User
+from app.streaks.intervals import floor_minute, session_islands, split_by_day
+from app.timezones import local_date
+from app.upsert import insert_for
+
+_COUNTERS = ('study_minutes', 'session_count', 'tasks_completed', 'focus_total', 'focus_count')
+
+
+def add_daily_stats(user_id, day, study_minutes=0, session_count=0, tasks_completed=0, focus_score=None):
+    """Add to one user's totals for a local ``day`` with a single upsert.
+
+    Increments are applied in SQL, so concurrent writers can't lose each
+    other's updates. Runs in the caller's transaction.
+    """
+    _add_rows([{
+        'user_id': user_id,
+        'day': day,
+        'study_minutes': study_minutes,
+        'session_count': session_count,
+        'tasks_completed': tasks_completed,
+        'focus_total': focus_score or 0,
+        'focus_count': 1 if focus_score is not None else 0
+    }])
+
+
+def _add_rows(rows):
+    """One multi-row upsert of increments; each (user_id, day) may appear once"""
+    table = DailyUserStat.__table__
+    insert = insert_for(db.session.get_bind())(table).values(rows)
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={name: table.c[name] + insert.excluded[name] for name in _COUNTERS}
+    ))
+    for row in rows:
+        record_write(db.session, DailyUserStat, user_id=row['user_id'], day=row['day'])
+
+
+def record_session_ends(sessions, timezones, fresh):
+    """Count ended sessions with one upsert for the whole batch.
+
+    ``fresh[session.id]`` holds the parts of each session not already
+    counted (see ``intervals.fresh_pieces``); they add study minutes to
+    the local days they fall on, so overlapping sessions count once. The
+    session itself, and its focus score, count on the day it ended.
+    """
+    seconds = defaultdict(float)
+    days = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+    for session in sessions:
+        tz_name = timezones.get(session.user_id)
+        for start, end in fresh[session.id][0]:
+            for day, length in split_by_day(start, end, tz_name):
+                seconds[(session.user_id, day)] += length
+        stats = days[(session.user_id, local_date(tz_name, session.end_time))]
+        stats['session_count'] += 1
+        if session.focus_score is not None:
+            stats['focus_total'] += session.focus_score
+            stats['focus_count'] += 1
+    for key, length in seconds.items():
+        days[key]['study_minutes'] += int(length // 60)
+
+    if days:
+        _add_rows([dict(user_id=user_id, day=day, **stats) for (user_id, day), stats in days.items()])
+
+
+def record_task_completion(task, tz_name, completed=True):
+    """Count (or with ``completed=False`` un-count) a completion on its local day"""
+    add_daily_stats(
+        task.user_id, local_date(tz_name, task.completed_at),
+        tasks_completed=1 if completed else -1
+    )
+
+
+def totals(user_id, start=None, end=None):
+    """Summed counters over the user's days in [start, end] (either bound optional)"""
+    criteria = [DailyUserStat.user_id == user_id]
+    if start is not None:
+        criteria.append(DailyUserStat.day >= start)
+    if end is not None:
+        criteria.append(DailyUserStat.day <= end)
+    row = db.session.query(
+        *[func.coalesce(func.sum(getattr(DailyUserStat, name)), 0) for name in _COUNTERS]
+    ).filter(*criteria).one()
+    return dict(zip(_COUNTERS, (int(value) for value in row)))
+
+
+def average_focus(stats):
+    return round(stats['focus_total'] / stats['focus_count'], 2) if stats['focus_count'] else None
+
+
+def rebuild_daily_stats(batch_size=1000):
+    """Recompute the whole rollup from sessions and tasks in one streaming pass"""
+    days = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+
+    # Study minutes come from the union of each user's sessions, so overlaps count once
+    islands = session_islands().subquery()
+    seconds = defaultdict(float)
+    for user_id, tz_name, start, end in db.session.execute(
+        select(islands.c.user_id, User.timezone, islands.c.start_time, islands.c.end_time)
+        .join(User, User.id == islands.c.user_id)
+        .execution_options(yield_per=5000)
+    ):
+        for day, length in split_by_day(floor_minute(start), floor_minute(end), tz_name):
+            seconds[(user_id, day)] += length
+    for key, length in seconds.items():
+        days[key]['study_minutes'] = int(length // 60)
+
+    sessions = db.session.execute(
+        select(StudySession.user_id, User.timezone, StudySession.end_time, StudySession.focus_score)
+        .join(User, User.id == StudySession.user_id)
+        .where(StudySession.end_time.isnot(None))
+        .execution_options(yield_per=5000)
+    )
+    for user_id, tz_name, end_time, focus in sessions:
+        stats = days[(user_id, local_date(tz_name, end_time))]
+        stats['session_count'] += 1
+        if focus is not None:
+            stats['focus_total'] += focus
+            stats['focus_count'] += 1
+
+    completions = db.session.execute(
+        select(Task.user_id, User.timezone, Task.completed_at)
+        .join(User, User.id == Task.user_id)
+        .where(Task.status == 'completed', Task.completed_at.isnot(None))
+        .execution_options(yield_per=5000)
+    )
+    for user_id, tz_name, completed_at in completions:
+        days[(user_id, local_date(tz_name, completed_at))]['tasks_completed'] += 1
+
+    db.session.query(DailyUserStat).delete(synchronize_session=False)
+    rows = [dict(user_id=user_id, day=day, **stats) for (user_id, day), stats in days.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(DailyUserStat.__table__.insert(), rows[start:start + batch_size])
+    db.session.commit()
+    return len(rows)
@@ -1,12 +1,28 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from app.models.schema import db, Streak, StudySession
+from app.models.schema import db, Goal, Streak, StudySession
 from datetime import datetime, date, timedelta
+from app.pagination import page_args, keyset_page, InvalidCursor
+from app.serializers import streak_serializer, study_session_serializer, list_projection, InvalidProjection
+from app.etag import conditional_get, collection_version
+from app.tags.stats import tag_criteria, InvalidTagFilter
+from app.tasks.progress import adjust_goal_progress
+from app.streaks import activity
+from app.streaks.advance import advance_streak
+from app.streaks import rollup
+from app.streaks.intervals import fresh_pieces, whole_minutes
+from app.streaks.stats import BUCKETS, range_stats, dump_stats
+from app.focus.samples import score_sessions
+from app.rewards.worker import queue_reward_check
+from app.timezones import local_today
 
 streaks_bp = Blueprint('streaks', __name__)
 
+MAX_CALENDAR_DAYS = 3660
+
 @streaks_bp.route('/api/streaks', methods=['GET'])
 @login_required
+@conditional_get(lambda user_id: collection_version(Streak, user_id))
 def get_streak():
     """Get current user's streak information"""
     streak = Streak.query.filter_by(user_id=current_user.id).first()
@@ -17,46 +33,23 @@ def get_streak():
         db.session.add(streak)
         db.session.commit()
     
-    return jsonify({
-        'current_streak': streak.current_streak,
-        'longest_streak': streak.longest_streak,
-        'last_activity_date': streak.last_activity_date.isoformat() if streak.last_activity_date else None,
-        'streak_type': streak.streak_type
-    })
+    return jsonify(streak_serializer.dump(streak))
 
 @streaks_bp.route('/api/streaks/update', methods=['POST'])
 @login_required
 def update_streak():
     """Update user's streak (called when user completes a task or study session)"""
-    streak = Streak.query.filter_by(user_id=current_user.id).first()
-    
-    if not streak:
-        streak = Streak(user_id=current_user.id)
-        db.session.add(streak)
-    
-    today = date.today()
-    
-    # Check if user already has activity today
-    if streak.last_activity_date == today:
-        return jsonify({'message': 'Already updated today', 'current_streak': streak.current_streak})
-    
-    # Check if this is consecutive day
-    if streak.last_activity_date and streak.last_activity_date == today - timedelta(days=1):
-        streak.current_streak += 1
-    else:
-        # Reset streak if not consecutive
-        streak.current_streak = 1
-    
-    # Update longest streak if current is longer
-    if streak.current_streak > streak.longest_streak:
-        streak.longest_streak = streak.current_streak
-    
-    streak.last_activity_date = today
+    current_streak, longest_streak, advanced = advance_streak(current_user.id, current_user.timezone)
+    if advanced:
+        queue_reward_check(current_user.id)
     db.session.commit()
     
+    if not advanced:
+        return jsonify({'message': 'Already updated today', 'current_streak': current_streak})
+    
     return jsonify({
-        'current_streak': streak.current_streak,
-        'longest_streak': streak.longest_streak,
+        'current_streak': current_streak,
+        'longest_streak': longest_streak,
         'message': 'Streak updated successfully'
     })
 
@@ -73,48 +66,115 @@ def reset_streak():
     
     return jsonify({'message': 'Streak reset successfully', 'current_streak': 0})
 
+@streaks_bp.route('/api/streaks/calendar', methods=['GET'])
+@login_required
+def get_activity_calendar():
+    """Active days between ?from= and ?to= (ISO dates, default the last year)"""
+    today = local_today(current_user.timezone)
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else today
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days > MAX_CALENDAR_DAYS:
+        return jsonify({'error': f'At most {MAX_CALENDAR_DAYS} days per request'}), 400
+    
+    bits = activity.load_bits(current_user.id)
+    start = max(start, activity.EPOCH)
+    days = activity.window(bits, start, end)
+    
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'active_days': [day.isoformat() for day in activity.active_dates(days, start)],
+        'total_active_days': activity.count_days(days),
+        'longest_streak': activity.longest_run(days),
+        'current_streak': activity.current_run(bits, today)
+    })
+
+@streaks_bp.route('/api/study-stats', methods=['GET'])
+@login_required
+def get_study_stats():
+    """Study totals per day, week or month between ?from= and ?to= (heatmaps, reports)"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': 'bucket must be one of: ' + ', '.join(BUCKETS)}), 400
+    
+    today = local_today(current_user.timezone)
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else today
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days > MAX_CALENDAR_DAYS:
+        return jsonify({'error': f'At most {MAX_CALENDAR_DAYS} days per request'}), 400
+    
+    buckets = range_stats(current_user.id, start, end, bucket, today)
+    summary = dict.fromkeys(buckets[0][1], 0)
+    for _, stats in buckets:
+        for name, value in stats.items():
+            summary[name] += value
+    
+    return jsonify({
+        'bucket': bucket,
+        'from': buckets[0][0].isoformat(),
+        'to': end.isoformat(),
+        'buckets': [dict(start=first.isoformat(), **dump_stats(stats)) for first, stats in buckets],
+        'totals': dump_stats(summary)
+    })
+
 @streaks_bp.route('/api/study-sessions', methods=['GET'])
 @login_required
 def get_study_sessions():
-    """Get user's study sessions"""
-    sessions = StudySession.query.filter_by(user_id=current_user.id).order_by(StudySession.start_time.desc()).all()
-    
-    return jsonify([{
-        'id': session.id,
-        'start_time': session.start_time.isoformat(),
-        'end_time': session.end_time.isoformat() if session.end_time else None,
-        'duration_minutes': session.duration_minutes,
-        'subject': session.subject,
-        'notes': session.notes,
-        'created_at': session.created_at.isoformat()
-    } for session in sessions])
+    """Get user's study sessions, newest first, one keyset page at a time"""
+    limit, cursor = page_args()
+    keys = (StudySession.start_time, StudySession.id)
+    try:
+        serializer, criteria = list_projection(study_session_serializer, keys)
+        criteria += tag_criteria(StudySession.tags)
+        sessions, next_cursor = keyset_page(
+            serializer.query(StudySession.user_id == current_user.id, *criteria),
+            keys, limit, cursor, descending=True
+        )
+    except (InvalidCursor, InvalidProjection, InvalidTagFilter) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'items': serializer.dump_rows(sessions), 'next_cursor': next_cursor})
 
 @streaks_bp.route('/api/study-sessions', methods=['POST'])
 @login_required
 def create_study_session():
     """Start a new study session"""
     data = request.json
+    goal_id = data.get('goal_id')
+    if goal_id is not None and not Goal.query.filter_by(id=goal_id, user_id=current_user.id).first():
+        return jsonify({'error': 'Goal not found'}), 404
+    
     new_session = StudySession(
         user_id=current_user.id,
+        goal_id=goal_id,
         start_time=datetime.utcnow(),
         subject=data.get('subject', ''),
-        notes=data.get('notes', '')
+        notes=data.get('notes', ''),
+        tags=data.get('tags', [])
     )
     db.session.add(new_session)
     db.session.commit()
     
-    return jsonify({
-        'id': new_session.id,
-        'start_time': new_session.start_time.isoformat(),
-        'subject': new_session.subject,
-        'notes': new_session.notes
-    }), 201
+    return jsonify(study_session_serializer.dump(new_session)), 201
 
 @streaks_bp.route('/api/study-sessions/<int:session_id>/end', methods=['PUT'])
 @login_required
 def end_study_session(session_id):
     """End a study session"""
-    session = StudySession.query.filter_by(id=session_id, user_id=current_user.id).first_or_404()
+    # Waits for any sample batch being written, so scoring sees all of them
+    session = StudySession.query.filter_by(
+        id=session_id, user_id=current_user.id
+    ).with_for_update().first_or_404()
     
     if session.end_time:
         return jsonify({'message': 'Session already ended'}), 400
@@ -122,15 +182,22 @@ def end_study_session(session_id):
     session.end_time = datetime.utcnow()
     session.duration_minutes = int((session.end_time - session.start_time).total_seconds() / 60)
     
-    db.session.commit()
+    # Scores come from the session's focus samples, if the timer sent any
+    score_sessions([session])
+    # Time already covered by the user's other sessions isn't counted twice
+    fresh = fresh_pieces([session])
+    adjust_goal_progress(session.goal_id, whole_minutes(fresh[session.id][1]))
+    advance_streak(current_user.id, current_user.timezone)
+    rollup.record_session_ends([session], {current_user.id: current_user.timezone}, fresh)
+    queue_reward_check(current_user.id)
     
-    # Update streak after study session
-    from app.streaks.routes import update_streak
-    update_streak()
+    db.session.commit()
     
     return jsonify({
         'id': session.id,
         'duration_minutes': session.duration_minutes,
+        'focus_score': session.focus_score,
+        'productivity_score': session.productivity_score,
         'message': 'Study session ended successfully'
     })
 
@@ -149,10 +216,12 @@ def get_streak_analytics():
             'average_session_length': 0
         })
     
-    # Get study session statistics
-    sessions = StudySession.query.filter_by(user_id=current_user.id).all()
-    total_sessions = len(sessions)
-    total_time = sum(s.duration_minutes or 0 for s in sessions)
+    bits = activity.load_bits(current_user.id)
+    
+    # Summed from the daily rollup: one row per active day, not per session
+    stats = rollup.totals(current_user.id)
+    total_sessions = stats['session_count']
+    total_time = stats['study_minutes']
     avg_session_length = total_time / total_sessions if total_sessions > 0 else 0
     
     return jsonify({
@@ -161,5 +230,8 @@ def get_streak_analytics():
         'total_study_sessions': total_sessions,
         'total_study_time': total_time,
         'average_session_length': round(avg_session_length, 2),
+        'total_tasks_completed': stats['tasks_completed'],
+        'average_focus_score': rollup.average_focus(stats),
+        'total_active_days': activity.count_days(bits),
         'can_join_groups': streak.current_streak >= 20
     }) 
\ No newline at end of file
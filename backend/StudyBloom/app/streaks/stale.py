@@ -0,0 +1,87 @@
+from collections import defaultdict
+from time import monotonic
+from datetime import datetime, timedelta
+from sqlalchemy import exists, func
+from app.focus.samples import score_sessions
+from app.models.schema import db, FocusMinute, FocusSample, StudySession, User
+from app.streaks import rollup
+from app.streaks.intervals import fresh_pieces, whole_minutes
+from app.tasks.progress import adjust_goal_progress
+
+
+def _last_activity(session_ids):
+    """Latest focus sample or downsampled minute per session, in two grouped queries"""
+    last = dict(db.session.query(FocusSample.session_id, func.max(FocusSample.recorded_at)).filter(
+        FocusSample.session_id.in_(session_ids)
+    ).group_by(FocusSample.session_id))
+    for session_id, minute in db.session.query(FocusMinute.session_id, func.max(FocusMinute.minute)).filter(
+        FocusMinute.session_id.in_(session_ids)
+    ).group_by(FocusMinute.session_id):
+        end = minute + timedelta(minutes=1)
+        if session_id not in last or end > last[session_id]:
+            last[session_id] = end
+    return last
+
+
+def close_stale_sessions(now=None, stale_after_hours=12, batch_size=500):
+    """End every session with no activity for more than ``stale_after_hours``.
+
+    A session is stale once its last focus sample or heartbeat (or its
+    start, if the timer never reported) is older than the cutoff, so a
+    long session that is still reporting stays open. It ends at its last focus sample or heartbeat, or at its
+    start when the timer never reported, so an abandoned session only
+    counts time that was evidently studied. Batches are picked with FOR
+    UPDATE SKIP LOCKED and committed one at a time, like the streak
+    rollover; each batch costs a fixed number of statements (one upsert
+    for the rollup, one UPDATE per goal, one scoring query) rather than a
+    few per session. Streaks are left alone, since the session's day has usually passed.
+    Returns (sessions closed, seconds taken).
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=stale_after_hours)
+    started = monotonic()
+    total = 0
+    recent_sample = exists().where(
+        FocusSample.session_id == StudySession.id, FocusSample.recorded_at >= cutoff
+    )
+    # A minute row covers activity up to the end of its minute
+    recent_minute = exists().where(
+        FocusMinute.session_id == StudySession.id, FocusMinute.minute >= cutoff - timedelta(minutes=1)
+    )
+    while True:
+        sessions = StudySession.query.filter(
+            StudySession.end_time.is_(None),
+            StudySession.start_time < cutoff,
+            ~recent_sample,
+            ~recent_minute
+        ).order_by(StudySession.id).limit(batch_size).with_for_update(
+            skip_locked=True, of=StudySession
+        ).all()
+        if not sessions:
+            break
+
+        last = _last_activity([session.id for session in sessions])
+        for session in sessions:
+            end = last.get(session.id)
+            session.end_time = min(max(end, session.start_time), now) if end else session.start_time
+            session.duration_minutes = int((session.end_time - session.start_time).total_seconds() / 60)
+        score_sessions(sessions)
+
+        fresh = fresh_pieces(sessions)
+        goal_minutes = defaultdict(int)
+        for session in sessions:
+            if session.goal_id is not None:
+                goal_minutes[session.goal_id] += whole_minutes(fresh[session.id][1])
+        for goal_id, minutes in goal_minutes.items():
+            adjust_goal_progress(goal_id, minutes)
+
+        timezones = dict(db.session.query(User.id, User.timezone).filter(
+            User.id.in_({session.user_id for session in sessions})
+        ))
+        rollup.record_session_ends(sessions, timezones, fresh)
+        db.session.commit()
+
+        total += len(sessions)
+        if len(sessions) < batch_size:
+            break
+    return total, monotonic() - started
@@ -0,0 +1,104 @@
+from datetime import timedelta
+from app.cache import TTLCache, invalidate_on_commit
+from app.models.schema import db, DailyUserStat
+from app.streaks.rollup import average_focus
+
+BUCKETS = ('day', 'week', 'month')
+
+_COUNTERS = ('study_minutes', 'session_count', 'tasks_completed', 'focus_total', 'focus_count')
+
+# Totals of closed buckets keyed by (user_id, bucket, start). A closed
+# bucket only changes when an old day is rewritten, which drops exactly
+# the buckets containing that day in this process. Other processes (web
+# workers, the stale-session job, rebuilds) can't reach this cache, so
+# the short TTL bounds how long they leave it stale.
+bucket_cache = TTLCache()
+_listeners_installed = False
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _bucket_keys(row):
+    return [(row.user_id, bucket, bucket_start(row.day, bucket)) for bucket in BUCKETS]
+
+
+def init_stats_cache(app):
+    global _listeners_installed
+    bucket_cache.maxsize = app.config.get('STUDY_STATS_CACHE_SIZE', 50000)
+    bucket_cache.ttl = app.config.get('STUDY_STATS_CACHE_TTL', 60)
+
+    if not _listeners_installed:
+        invalidate_on_commit(bucket_cache, [DailyUserStat], key=_bucket_keys, multi=True)
+        _listeners_installed = True
+
+
+def _empty():
+    return dict.fromkeys(_COUNTERS, 0)
+
+
+def range_stats(user_id, start, end, bucket, today):
+    """Per-bucket totals covering start..end, widened to whole buckets.
+
+    Closed buckets (ending before ``today``) come from the cache when
+    possible; everything else is summed from one daily_user_stats range
+    scan over just the uncached span.
+    """
+    starts = []
+    cursor = bucket_start(start, bucket)
+    while cursor <= end:
+        starts.append(cursor)
+        cursor = next_bucket(cursor, bucket)
+
+    totals = {}
+    missing = []
+    for first in starts:
+        cached = bucket_cache.get((user_id, bucket, first))
+        if cached is not None:
+            totals[first] = cached
+        else:
+            missing.append(first)
+
+    if missing:
+        for first in missing:
+            totals[first] = _empty()
+        columns = [getattr(DailyUserStat, name) for name in _COUNTERS]
+        rows = db.session.query(DailyUserStat.day, *columns).filter(
+            DailyUserStat.user_id == user_id,
+            DailyUserStat.day >= missing[0],
+            DailyUserStat.day < next_bucket(missing[-1], bucket)
+        ).all()
+        uncached = set(missing)
+        for day, *values in rows:
+            first = bucket_start(day, bucket)
+            if first in uncached:
+                stats = totals[first]
+                for name, value in zip(_COUNTERS, values):
+                    stats[name] += value
+        for first in missing:
+            if next_bucket(first, bucket) <= today:
+                bucket_cache.set((user_id, bucket, first), totals[first])
+
+    return [(first, totals[first]) for first in starts]
+
+
+def dump_stats(stats):
+    return {
+        'study_minutes': stats['study_minutes'],
+        'session_count': stats['session_count'],
+        'tasks_completed': stats['tasks_completed'],
+        'average_focus_score': average_focus(stats)
+    }
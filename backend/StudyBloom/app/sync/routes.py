@@ -0,0 +1,60 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_login import login_required, current_user
+from app.models.schema import db, Goal, Task, Reminder, StudySession, Tombstone
+from app.pagination import encode_cursor, decode_cursor, InvalidCursor
+from app.serializers import goal_serializer, task_serializer, reminder_serializer, study_session_serializer
+from datetime import datetime, timedelta
+
+sync_bp = Blueprint('sync', __name__)
+
+# Collection name -> (model, serializer); the names double as tombstone entity types
+SYNCED_COLLECTIONS = {
+    'goals': (Goal, goal_serializer),
+    'tasks': (Task, task_serializer),
+    'reminders': (Reminder, reminder_serializer),
+    'study_sessions': (StudySession, study_session_serializer)
+}
+
+@sync_bp.route('/api/sync', methods=['GET'])
+@login_required
+def sync_changes():
+    """Rows created, updated or deleted since the client's last sync token"""
+    now = datetime.utcnow()
+    retention = timedelta(days=current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+    
+    since = None
+    token = request.args.get('since')
+    if token:
+        try:
+            since = decode_cursor(token, (Tombstone.deleted_at,))[0]
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid sync token'}), 400
+    
+    # Tombstones past retention are gone, so a stale client must start over
+    reset = since is not None and since < now - retention
+    if reset:
+        since = None
+    
+    payload = {}
+    for name, (model, serializer) in SYNCED_COLLECTIONS.items():
+        criteria = [model.user_id == current_user.id]
+        if since is not None:
+            criteria.append(model.updated_at >= since)
+        payload[name] = serializer.dump_rows(serializer.query(*criteria).all())
+    
+    deleted = {name: [] for name in SYNCED_COLLECTIONS}
+    if since is not None:
+        tombstones = db.session.query(Tombstone.entity_type, Tombstone.entity_id).filter(
+            Tombstone.user_id == current_user.id,
+            Tombstone.deleted_at >= since
+        ).all()
+        for entity_type, entity_id in tombstones:
+            deleted.setdefault(entity_type, []).append(entity_id)
+    payload['deleted'] = deleted
+    
+    # Overlap the next window slightly so rows committed during this request aren't missed
+    skew = timedelta(seconds=current_app.config.get('SYNC_CLOCK_SKEW_SECONDS', 5))
+    payload['next_token'] = encode_cursor([now - skew])
+    payload['reset'] = since is None
+    
+    return jsonify(payload)
@@ -0,0 +1,15 @@
+from datetime import datetime, timedelta
+from app.models.schema import db, Tombstone
+
+
+def record_tombstone(user_id, entity_type, entity_id):
+    """Leave a marker so offline clients learn about the delete on their next sync"""
+    db.session.add(Tombstone(user_id=user_id, entity_type=entity_type, entity_id=entity_id))
+
+
+def prune_tombstones(retention_days):
+    """Drop tombstones older than the sync retention window; returns rows deleted"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = Tombstone.query.filter(Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from app.models.schema import db, UserTagStat
+
+tags_bp = Blueprint('tags', __name__)
+
+@tags_bp.route('/api/tags', methods=['GET'])
+@login_required
+def get_tags():
+    """Per-tag task/session counts and study minutes, most used first.
+
+    Reads the user_tag_stats aggregate, so the cost is one primary-key
+    range scan regardless of how much history the user has.
+    """
+    usage = UserTagStat.task_count + UserTagStat.session_count
+    rows = db.session.query(
+        UserTagStat.tag, UserTagStat.task_count, UserTagStat.session_count, UserTagStat.study_minutes
+    ).filter(
+        UserTagStat.user_id == current_user.id,
+        usage > 0
+    ).order_by(usage.desc(), UserTagStat.tag).all()
+    
+    return jsonify({
+        'tags': [
+            {'tag': tag, 'task_count': tasks, 'session_count': sessions, 'study_minutes': minutes}
+            for tag, tasks, sessions, minutes in rows
+        ]
+    })
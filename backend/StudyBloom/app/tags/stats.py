@@ -0,0 +1,140 @@
+from collections import defaultdict
+from flask import request
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.orm import Session
+from app.models.schema import db, Task, StudySession, UserTagStat
+from app.upsert import insert_for
+
+TAG_MATCH_MODES = ('any', 'all')
+
+_listeners_installed = False
+
+
+class InvalidTagFilter(ValueError):
+    pass
+
+
+def tag_criteria(column):
+    """Filters for ?tag=a&tag=b[&tag_match=all] against an ARRAY ``column``.
+
+    ``any`` (the default) uses the GIN-indexed && overlap operator, ``all``
+    the @> containment operator. On SQLite the tags are a JSON array and
+    both are answered with json_each().
+    """
+    tags = [tag for tag in request.args.getlist('tag') if tag]
+    if not tags:
+        return []
+    match = request.args.get('tag_match', 'any')
+    if match not in TAG_MATCH_MODES:
+        raise InvalidTagFilter("tag_match must be 'any' or 'all'")
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return [_json_tag_match(column, tags, match)]
+    return [column.contains(tags) if match == 'all' else column.overlap(tags)]
+
+
+def _json_tag_match(column, tags, match):
+    each = func.json_each(column).table_valued('value')
+    matched = select(func.count(func.distinct(each.c.value))).where(each.c.value.in_(tags)).scalar_subquery()
+    return matched == len(set(tags)) if match == 'all' else matched > 0
+
+
+def _before_after(obj, attr):
+    """(value before this flush, value after) for one attribute"""
+    history = inspect(obj).attrs[attr].history
+    if history.has_changes():
+        before = history.deleted[0] if history.deleted else None
+        after = history.added[0] if history.added else None
+        return before, after
+    value = history.unchanged[0] if history.unchanged else getattr(obj, attr)
+    return value, value
+
+
+def _contribution(obj, tags, minutes):
+    """What one row adds to its owner's (task_count, session_count, study_minutes) per tag"""
+    if isinstance(obj, Task):
+        counts = (1, 0, 0)
+    else:
+        counts = (0, 1, minutes or 0)
+    return {tag: counts for tag in set(tags or [])}
+
+
+def _collect_deltas(session):
+    deltas = defaultdict(lambda: [0, 0, 0])
+
+    def apply(user_id, contribution, sign):
+        for tag, counts in contribution.items():
+            delta = deltas[(user_id, tag)]
+            for i, value in enumerate(counts):
+                delta[i] += sign * value
+
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, (Task, StudySession)):
+            continue
+        tags_before, tags_after = _before_after(obj, 'tags')
+        minutes_before = minutes_after = None
+        if isinstance(obj, StudySession):
+            minutes_before, minutes_after = _before_after(obj, 'duration_minutes')
+
+        if obj in session.new:
+            apply(obj.user_id, _contribution(obj, tags_after, minutes_after), 1)
+        elif obj in session.deleted:
+            apply(obj.user_id, _contribution(obj, tags_before, minutes_before), -1)
+        elif tags_before != tags_after or minutes_before != minutes_after:
+            apply(obj.user_id, _contribution(obj, tags_before, minutes_before), -1)
+            apply(obj.user_id, _contribution(obj, tags_after, minutes_after), 1)
+
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def _apply_tag_deltas(session, flush_context):
+    """Fold this flush's tag changes into user_tag_stats with one upsert"""
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+
+    connection = session.connection()
+    table = UserTagStat.__table__
+    insert = insert_for(connection)(table)
+    statement = insert.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.tag],
+        set_={
+            'task_count': table.c.task_count + insert.excluded.task_count,
+            'session_count': table.c.session_count + insert.excluded.session_count,
+            'study_minutes': table.c.study_minutes + insert.excluded.study_minutes
+        }
+    )
+    connection.execute(statement, [
+        {'user_id': user_id, 'tag': tag, 'task_count': tasks,
+         'session_count': sessions, 'study_minutes': minutes}
+        for (user_id, tag), (tasks, sessions, minutes) in deltas.items()
+    ])
+
+
+def rebuild_tag_stats():
+    """Recompute user_tag_stats from scratch in set-based statements (PostgreSQL)"""
+    db.session.execute(text('DELETE FROM user_tag_stats'))
+    result = db.session.execute(text("""
+        INSERT INTO user_tag_stats (user_id, tag, task_count, session_count, study_minutes)
+        SELECT user_id, tag, SUM(task_count), SUM(session_count), SUM(study_minutes)
+        FROM (
+            SELECT DISTINCT id, user_id, unnest(tags) AS tag,
+                   1 AS task_count, 0 AS session_count, 0 AS study_minutes
+            FROM tasks
+            UNION ALL
+            SELECT DISTINCT id, user_id, unnest(tags), 0, 1, COALESCE(duration_minutes, 0)
+            FROM study_sessions
+        ) AS tagged
+        GROUP BY user_id, tag
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_tag_stats():
+    """Hook the aggregate upkeep onto every session flush"""
+    global _listeners_installed
+    if not _listeners_installed:
+        # Task.tags, StudySession.tags and duration_minutes are mapped with
+        # active_history, so the old value is at hand to subtract
+        event.listen(Session, 'after_flush', _apply_tag_deltas)
+        _listeners_installed = True
@@ -0,0 +1,77 @@
+from datetime import datetime
+from sqlalchemy import func, text, tuple_
+from app.cache import record_write
+from app.models.schema import db, Task
+
+# Positions are spaced this far apart so a move can usually take the midpoint
+POSITION_GAP = 1024
+
+
+def next_position(user_id):
+    """Position that appends a task to the end of the user's board"""
+    last = db.session.query(func.max(Task.position)).filter(Task.user_id == user_id).scalar()
+    return (last or 0) + POSITION_GAP
+
+
+def renumber_positions(user_id):
+    """Re-space every task of the user by POSITION_GAP in one statement"""
+    db.session.execute(text("""
+        UPDATE tasks
+        SET position = ranked.rn * :gap, updated_at = :now
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (ORDER BY position, id) AS rn
+            FROM tasks
+            WHERE user_id = :user_id
+        ) AS ranked
+        WHERE tasks.id = ranked.id
+    """), {'gap': POSITION_GAP, 'now': datetime.utcnow(), 'user_id': user_id})
+    record_write(db.session, Task, user_id=user_id)
+
+
+def _neighbours(user_id, task_id, after_id):
+    """(previous, next) as (position, id) pairs around the slot after ``after_id``"""
+    others = db.session.query(Task.position, Task.id).filter(
+        Task.user_id == user_id,
+        Task.id != task_id
+    )
+    previous = None
+    if after_id is not None:
+        previous = others.filter(Task.id == after_id).first()
+        if previous is None:
+            raise LookupError(after_id)
+        others = others.filter(tuple_(Task.position, Task.id) > tuple_(*previous))
+    following = others.order_by(Task.position, Task.id).first()
+    return previous, following
+
+
+def _slot_position(previous, following):
+    if previous is None and following is None:
+        return POSITION_GAP
+    if previous is None:
+        return following.position - POSITION_GAP
+    if following is None:
+        return previous.position + POSITION_GAP
+    if following.position - previous.position > 1:
+        return (previous.position + following.position) // 2
+    return None
+
+
+def move_task(user_id, task_id, after_id=None):
+    """Place a task directly after ``after_id`` (or first when None).
+
+    Usually rewrites only the moved row; when the neighbours have no room
+    left between them the board is re-spaced once and the move retried.
+    """
+    previous, following = _neighbours(user_id, task_id, after_id)
+    position = _slot_position(previous, following)
+    if position is None:
+        renumber_positions(user_id)
+        previous, following = _neighbours(user_id, task_id, after_id)
+        position = _slot_position(previous, following)
+
+    Task.query.filter_by(id=task_id, user_id=user_id).execution_options(cache_keys_recorded=True).update(
+        {'position': position, 'updated_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    record_write(db.session, Task, user_id=user_id)
+    return position
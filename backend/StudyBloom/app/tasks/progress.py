@@ -0,0 +1,67 @@
+from datetime import datetime
+from sqlalchemy import case, func, select, update
+from app.cache import record_write
+from app.models.schema import db, Goal, Task, StudySession
+from app.streaks.intervals import session_islands
+
+
+def task_goal_minutes(task):
+    """Minutes a task contributes to its goal: its actual minutes once completed"""
+    if task.status == 'completed':
+        return task.actual_minutes or 0
+    return 0
+
+
+def _progress_values(minutes):
+    """Column values for a goal whose completed_minutes becomes ``minutes`` (a SQL expression)"""
+    reached = (Goal.target_minutes > 0) & (minutes >= Goal.target_minutes)
+    return {
+        'completed_minutes': minutes,
+        'completion_percentage': case(
+            (reached, 100),
+            (Goal.target_minutes > 0, minutes * 100 / Goal.target_minutes),
+            else_=0
+        ),
+        'completed': case((reached, True), else_=Goal.completed),
+        'updated_at': datetime.utcnow()
+    }
+
+
+def adjust_goal_progress(goal_id, delta):
+    """Add ``delta`` minutes to a goal in one atomic UPDATE.
+
+    The increment happens in SQL (x = x + delta), so concurrent writers
+    never overwrite each other's progress. Runs in the caller's transaction.
+    """
+    if goal_id is None or not delta:
+        return
+    minutes = func.coalesce(Goal.completed_minutes, 0) + delta
+    user_id = db.session.execute(
+        update(Goal).where(Goal.id == goal_id).values(_progress_values(minutes)).returning(Goal.user_id)
+        .execution_options(synchronize_session=False, cache_keys_recorded=True)
+    ).scalar()
+    if user_id is not None:
+        record_write(db.session, Goal, user_id=user_id)
+
+
+def reconcile_goals():
+    """Recompute every goal's progress from its tasks and sessions in one statement.
+
+    Only goals that have drifted are written; returns how many there were.
+    """
+    task_minutes = select(func.coalesce(func.sum(Task.actual_minutes), 0)).where(
+        Task.goal_id == Goal.id,
+        Task.status == 'completed'
+    ).scalar_subquery()
+    # Sessions count by the union of their time, so overlapping ones count once
+    islands = session_islands(StudySession.goal_id.isnot(None), per_goal=True).subquery()
+    session_minutes = select(func.coalesce(func.sum(islands.c.minutes), 0)).where(
+        islands.c.goal_id == Goal.id
+    ).scalar_subquery()
+    minutes = task_minutes + session_minutes
+
+    drifted = Goal.query.filter(Goal.completed_minutes.is_distinct_from(minutes)).update(
+        _progress_values(minutes), synchronize_session=False
+    )
+    db.session.commit()
+    return drifted
@@ -3,31 +3,37 @@ from flask_login import login_required, current_user
 from app.models.schema import db, Goal, Task
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
+from app.pagination import page_args, keyset_page, InvalidCursor
+from app.serializers import goal_serializer, task_serializer, embedded_goal_serializer, list_projection, InvalidProjection
+from app.etag import conditional_get, collection_version
+from app.sync.tombstones import record_tombstone
+from app.tasks.ordering import move_task, next_position
+from app.tasks.progress import adjust_goal_progress, task_goal_minutes
+from app.streaks.advance import advance_streak
+from app.streaks.rollup import record_task_completion
+from app.rewards.worker import queue_reward_check
+from app.tags.stats import tag_criteria, InvalidTagFilter
 
 tasks_bp = Blueprint('tasks', __name__)
 
+MAX_REORDER_MOVES = 200
+
 @tasks_bp.route('/api/goals', methods=['GET'])
 @login_required
+@conditional_get(lambda user_id: collection_version(Goal, user_id))
 def get_goals():
-    """Get all goals for the current user"""
+    """Get the current user's goals, one keyset page at a time"""
+    limit, cursor = page_args()
+    keys = (Goal.created_at, Goal.id)
     try:
-        goals = Goal.query.filter_by(user_id=current_user.id).all()
-        return jsonify([{
-            'id': goal.id,
-            'title': goal.title,
-            'description': goal.description,
-            'deadline': goal.deadline.isoformat() if goal.deadline else None,
-            'completed': goal.completed,
-            'completion_percentage': goal.completion_percentage,
-            'target_minutes': goal.target_minutes,
-            'completed_minutes': goal.completed_minutes,
-            'category': goal.category,
-            'priority': goal.priority,
-            'color': goal.color,
-            'icon': goal.icon,
-            'created_at': goal.created_at.isoformat(),
-            'updated_at': goal.updated_at.isoformat()
-        } for goal in goals]), 200
+        serializer, criteria = list_projection(goal_serializer, keys)
+        goals, next_cursor = keyset_page(
+            serializer.query(Goal.user_id == current_user.id, *criteria),
+            keys, limit, cursor
+        )
+        return jsonify({'items': serializer.dump_rows(goals), 'next_cursor': next_cursor}), 200
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch goals'}), 500
 
@@ -60,22 +66,7 @@ def create_goal():
         db.session.add(new_goal)
         db.session.commit()
         
-        return jsonify({
-            'id': new_goal.id,
-            'title': new_goal.title,
-            'description': new_goal.description,
-            'deadline': new_goal.deadline.isoformat() if new_goal.deadline else None,
-            'completed': new_goal.completed,
-            'completion_percentage': new_goal.completion_percentage,
-            'target_minutes': new_goal.target_minutes,
-            'completed_minutes': new_goal.completed_minutes,
-            'category': new_goal.category,
-            'priority': new_goal.priority,
-            'color': new_goal.color,
-            'icon': new_goal.icon,
-            'created_at': new_goal.created_at.isoformat(),
-            'updated_at': new_goal.updated_at.isoformat()
-        }), 201
+        return jsonify(goal_serializer.dump(new_goal)), 201
         
     except ValueError as e:
         return jsonify({'error': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
@@ -128,21 +119,7 @@ def update_goal(goal_id):
         
         return jsonify({
             'message': 'Goal updated successfully',
-            'goal': {
-                'id': goal.id,
-                'title': goal.title,
-                'description': goal.description,
-                'deadline': goal.deadline.isoformat() if goal.deadline else None,
-                'completed': goal.completed,
-                'completion_percentage': goal.completion_percentage,
-                'target_minutes': goal.target_minutes,
-                'completed_minutes': goal.completed_minutes,
-                'category': goal.category,
-                'priority': goal.priority,
-                'color': goal.color,
-                'icon': goal.icon,
-                'updated_at': goal.updated_at.isoformat()
-            }
+            'goal': goal_serializer.dump(goal)
         }), 200
         
     except SQLAlchemyError as e:
@@ -161,6 +138,7 @@ def delete_goal(goal_id):
         if not goal:
             return jsonify({'error': 'Goal not found'}), 404
         
+        record_tombstone(current_user.id, 'goals', goal.id)
         db.session.delete(goal)
         db.session.commit()
         
@@ -173,28 +151,47 @@ def delete_goal(goal_id):
         db.session.rollback()
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+def _tasks_version(user_id):
+    """Task collection version, plus the goals' when ?include=goal embeds them"""
+    version = collection_version(Task, user_id)
+    if 'goal' in request.args.get('include', '').split(','):
+        version += collection_version(Goal, user_id)
+    return version
+
 @tasks_bp.route('/api/tasks', methods=['GET'])
 @login_required
+@conditional_get(_tasks_version)
 def get_tasks():
-    """Get all tasks for the current user"""
+    """Get the current user's tasks in board order, one keyset page at a time.
+
+    Supports ?fields= projections, ?ids= multi-get, ?tag= filters and ?include=goal.
+    """
+    limit, cursor = page_args()
+    keys = (Task.position, Task.id)
     try:
-        tasks = Task.query.filter_by(user_id=current_user.id).all()
-        return jsonify([{
-            'id': task.id,
-            'goal_id': task.goal_id,
-            'title': task.title,
-            'description': task.description,
-            'status': task.status,
-            'priority': task.priority,
-            'due_date': task.due_date.isoformat() if task.due_date else None,
-            'estimated_minutes': task.estimated_minutes,
-            'actual_minutes': task.actual_minutes,
-            'completed_at': task.completed_at.isoformat() if task.completed_at else None,
-            'position': task.position,
-            'tags': task.tags or [],
-            'created_at': task.created_at.isoformat(),
-            'updated_at': task.updated_at.isoformat()
-        } for task in tasks]), 200
+        serializer, criteria = list_projection(task_serializer, keys)
+        include = {name for name in request.args.get('include', '').split(',') if name}
+        if include - {'goal'}:
+            raise InvalidProjection('Only include=goal is supported')
+        
+        criteria += tag_criteria(Task.tags)
+        query = serializer.query(Task.user_id == current_user.id, *criteria)
+        if 'goal' in include:
+            # Same SELECT, one LEFT JOIN; goal columns ride along after the task's
+            query = query.outerjoin(Goal, Goal.id == Task.goal_id).add_columns(
+                *embedded_goal_serializer.labelled('included_goal_')
+            )
+        tasks, next_cursor = keyset_page(query, keys, limit, cursor)
+        
+        items = serializer.dump_rows(tasks)
+        if 'goal' in include:
+            width = len(serializer.fields)
+            goals = embedded_goal_serializer.dump_rows([row[width:] for row in tasks])
+            for item, goal in zip(items, goals):
+                item['goal'] = goal if goal['id'] is not None else None
+        return jsonify({'items': items, 'next_cursor': next_cursor}), 200
+    except (InvalidCursor, InvalidProjection, InvalidTagFilter) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch tasks'}), 500
 
@@ -220,28 +217,14 @@ def create_task():
             due_date=datetime.fromisoformat(data['due_date']) if data.get('due_date') else None,
             estimated_minutes=data.get('estimated_minutes'),
             priority=data.get('priority', 'medium'),
-            position=data.get('position', 0),
+            position=data['position'] if data.get('position') is not None else next_position(current_user.id),
             tags=data.get('tags', [])
         )
         
         db.session.add(new_task)
         db.session.commit()
         
-        return jsonify({
-            'id': new_task.id,
-            'goal_id': new_task.goal_id,
-            'title': new_task.title,
-            'description': new_task.description,
-            'status': new_task.status,
-            'priority': new_task.priority,
-            'due_date': new_task.due_date.isoformat() if new_task.due_date else None,
-            'estimated_minutes': new_task.estimated_minutes,
-            'actual_minutes': new_task.actual_minutes,
-            'position': new_task.position,
-            'tags': new_task.tags or [],
-            'created_at': new_task.created_at.isoformat(),
-            'updated_at': new_task.updated_at.isoformat()
-        }), 201
+        return jsonify(task_serializer.dump(new_task)), 201
         
     except ValueError as e:
         return jsonify({'error': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'}), 400
@@ -252,6 +235,48 @@ def create_task():
         db.session.rollback()
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@tasks_bp.route('/api/tasks/reorder', methods=['POST'])
+@login_required
+def reorder_tasks():
+    """Apply a batch of drag-and-drop moves in a single transaction"""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+    
+    moves = request.json.get('moves')
+    if not isinstance(moves, list) or not moves:
+        return jsonify({'error': 'moves must be a non-empty list'}), 400
+    if len(moves) > MAX_REORDER_MOVES:
+        return jsonify({'error': f'At most {MAX_REORDER_MOVES} moves per request'}), 400
+    if any(not isinstance(move, dict) or 'id' not in move for move in moves):
+        return jsonify({'error': 'Each move needs an id'}), 400
+    
+    task_ids = {move['id'] for move in moves}
+    owned = {task_id for (task_id,) in db.session.query(Task.id).filter(
+        Task.user_id == current_user.id,
+        Task.id.in_(task_ids)
+    )}
+    if owned != task_ids:
+        return jsonify({'error': 'Task not found'}), 404
+    
+    try:
+        positions = []
+        for move in moves:
+            position = move_task(current_user.id, move['id'], move.get('after_id'))
+            positions.append({'id': move['id'], 'position': position})
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Tasks reordered successfully',
+            'positions': positions
+        }), 200
+        
+    except LookupError:
+        db.session.rollback()
+        return jsonify({'error': 'Task not found'}), 404
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to reorder tasks'}), 500
+
 @tasks_bp.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @login_required
 def update_task(task_id):
@@ -265,6 +290,7 @@ def update_task(task_id):
             return jsonify({'error': 'Task not found'}), 404
         
         data = request.json
+        minutes_before = task_goal_minutes(task)
         
         # Update fields if provided
         if 'title' in data:
@@ -284,7 +310,8 @@ def update_task(task_id):
             task.estimated_minutes = data['estimated_minutes']
         if 'actual_minutes' in data:
             task.actual_minutes = data['actual_minutes']
-        if 'position' in data:
+        # position is part of the keyset; a NULL would drop the task from paging
+        if data.get('position') is not None:
             task.position = data['position']
         if 'tags' in data:
             task.tags = data['tags']
@@ -292,29 +319,21 @@ def update_task(task_id):
         # Handle completion
         if data.get('status') == 'completed' and not task.completed_at:
             task.completed_at = datetime.utcnow()
-        elif data.get('status') != 'completed':
+            advance_streak(current_user.id, current_user.timezone)
+            record_task_completion(task, current_user.timezone)
+            queue_reward_check(current_user.id)
+        elif 'status' in data and data['status'] != 'completed':
+            if task.completed_at:
+                record_task_completion(task, current_user.timezone, completed=False)
             task.completed_at = None
         
         task.updated_at = datetime.utcnow()
+        adjust_goal_progress(task.goal_id, task_goal_minutes(task) - minutes_before)
         db.session.commit()
         
         return jsonify({
             'message': 'Task updated successfully',
-            'task': {
-                'id': task.id,
-                'goal_id': task.goal_id,
-                'title': task.title,
-                'description': task.description,
-                'status': task.status,
-                'priority': task.priority,
-                'due_date': task.due_date.isoformat() if task.due_date else None,
-                'estimated_minutes': task.estimated_minutes,
-                'actual_minutes': task.actual_minutes,
-                'completed_at': task.completed_at.isoformat() if task.completed_at else None,
-                'position': task.position,
-                'tags': task.tags or [],
-                'updated_at': task.updated_at.isoformat()
-            }
+            'task': task_serializer.dump(task)
         }), 200
         
     except SQLAlchemyError as e:
@@ -333,6 +352,10 @@ def delete_task(task_id):
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
+        record_tombstone(current_user.id, 'tasks', task.id)
+        adjust_goal_progress(task.goal_id, -task_goal_minutes(task))
+        if task.completed_at:
+            record_task_completion(task, current_user.timezone, completed=False)
         db.session.delete(task)
         db.session.commit()
         
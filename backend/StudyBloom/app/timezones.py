@@ -0,0 +1,31 @@
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name):
+    """ZoneInfo for an IANA name, cached per process; unknown names fall back to UTC"""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def local_date(tz_name, utc_dt):
+    """Calendar date in ``tz_name`` of a naive UTC datetime"""
+    return utc_dt.replace(tzinfo=timezone.utc).astimezone(get_zone(tz_name)).date()
+
+
+def local_today(tz_name, now=None):
+    return local_date(tz_name, now or datetime.utcnow())
+
+
+def day_end_utc(tz_name, day):
+    """Naive UTC instant at which local ``day`` ends (the following local midnight)"""
+    midnight = datetime.combine(day + timedelta(days=1), time(), tzinfo=get_zone(tz_name))
+    return midnight.astimezone(timezone.utc).replace(tzinfo=None)
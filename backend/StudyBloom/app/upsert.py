@@ -0,0 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def insert_for(bind):
+    """The dialect's ``insert()``, which supports ON CONFLICT clauses.
+
+    PostgreSQL and SQLite spell upserts the same way, so callers can build
+    ``insert_for(bind)(table).on_conflict_do_update(...)`` once for both.
+    """
+    if bind.dialect.name == 'sqlite':
+        return sqlite.insert
+    return postgresql.insert
@@ -0,0 +1,6 @@
+from app import create_app
+from app.rewards import worker
+
+# Entry point for the reward worker: celery -A celery_worker.celery worker
+app = create_app()
+celery = worker.celery
@@ -82,7 +82,7 @@ CREATE TABLE tasks (
     actual_minutes INTEGER,
     completed_at TIMESTAMP,
     reminder_sent BOOLEAN DEFAULT FALSE,
-    position INTEGER DEFAULT 0,
+    position INTEGER NOT NULL DEFAULT 0,
     tags VARCHAR(255)[] DEFAULT '{}',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -113,6 +113,7 @@ CREATE TABLE streaks (
     current_streak INTEGER DEFAULT 0,
     longest_streak INTEGER DEFAULT 0,
     last_activity_date DATE,
+    lapses_at TIMESTAMP,
     total_days_active INTEGER DEFAULT 0,
     streak_type VARCHAR(20) DEFAULT 'daily'
         CHECK (streak_type IN ('daily', 'weekly', 'monthly')),
@@ -146,8 +147,9 @@ CREATE TABLE study_sessions (
 CREATE TABLE rewards (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    rule_code VARCHAR(50),
     reward_type VARCHAR(50) NOT NULL
-        CHECK (reward_type IN ('discount', 'badge', 'feature', 'content')),
+        CHECK (reward_type IN ('discount', 'badge', 'feature', 'feature_unlock', 'content')),
     reward_value DECIMAL(10,2),
     description TEXT NOT NULL,
     unlocked_at TIMESTAMP NOT NULL,
@@ -155,7 +157,8 @@ CREATE TABLE rewards (
     is_used BOOLEAN DEFAULT FALSE,
     used_at TIMESTAMP,
     metadata JSONB DEFAULT '{}',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_rewards_user_rule UNIQUE (user_id, rule_code)
 );
 
 -- 9. Groups Table
@@ -241,6 +244,83 @@ CREATE TABLE notifications (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 14. Tombstones Table (deletions replayed by /api/sync)
+CREATE TABLE tombstones (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    entity_type VARCHAR(30) NOT NULL,
+    entity_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 15. User Tag Stats Table (per-tag totals behind /api/tags)
+CREATE TABLE user_tag_stats (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tag VARCHAR(255) NOT NULL,
+    task_count INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    study_minutes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, tag)
+);
+
+-- 16. Activity Bitmaps Table (bit i = active on 2020-01-01 + i days)
+CREATE TABLE activity_bitmaps (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    bits BYTEA NOT NULL DEFAULT '',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 17. Daily User Stats Table (per user per local day rollup)
+CREATE TABLE daily_user_stats (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    study_minutes INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    tasks_completed INTEGER NOT NULL DEFAULT 0,
+    focus_total INTEGER NOT NULL DEFAULT 0,
+    focus_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- 18. Focus Samples Table (raw in-session samples; NULL focus = heartbeat)
+CREATE TABLE focus_samples (
+    session_id INTEGER NOT NULL REFERENCES study_sessions(id) ON DELETE CASCADE,
+    recorded_at TIMESTAMP NOT NULL,
+    focus SMALLINT,
+    PRIMARY KEY (session_id, recorded_at)
+);
+
+-- 19. Focus Minutes Table (per-minute downsample of old focus samples)
+CREATE TABLE focus_minutes (
+    session_id INTEGER NOT NULL REFERENCES study_sessions(id) ON DELETE CASCADE,
+    minute TIMESTAMP NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    focus_count INTEGER NOT NULL DEFAULT 0,
+    focus_sum INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (session_id, minute)
+);
+
+-- 20. Reward Rules Table (catalog evaluated by app.rewards.rules)
+CREATE TABLE reward_rules (
+    code VARCHAR(50) PRIMARY KEY,
+    metric VARCHAR(50) NOT NULL
+        CHECK (metric IN ('current_streak', 'longest_streak', 'study_minutes', 'session_count', 'tasks_completed')),
+    threshold INTEGER NOT NULL,
+    reward_type VARCHAR(50) NOT NULL,
+    reward_value DECIMAL(10,2),
+    description TEXT NOT NULL,
+    requirement VARCHAR(255),
+    expires_after_days INTEGER,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO reward_rules (code, metric, threshold, reward_type, reward_value, description, requirement, expires_after_days) VALUES
+    ('streak_7_discount', 'current_streak', 7, 'discount', 10.00, '7-day streak discount: 10% off next subscription', '7-day study streak', 30),
+    ('streak_14_discount', 'current_streak', 14, 'discount', 15.00, '14-day streak discount: 15% off next subscription', '14-day study streak', 30),
+    ('streak_20_groups', 'current_streak', 20, 'feature_unlock', 100.00, '20-day streak: Unlock study groups feature', '20-day study streak', NULL),
+    ('streak_20_discount', 'current_streak', 20, 'discount', 25.00, '20-day streak discount: 25% off next subscription', '20-day study streak', 30);
+
 -- Indexes for better performance
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_users_username ON users(username);
@@ -257,6 +337,7 @@ CREATE INDEX idx_reminders_task_id ON reminders(task_id);
 CREATE INDEX idx_reminders_status ON reminders(status);
 CREATE INDEX idx_reminders_time ON reminders(reminder_time);
 CREATE INDEX idx_streaks_user_id ON streaks(user_id);
+CREATE INDEX idx_streaks_lapses_at ON streaks(lapses_at);
 CREATE INDEX idx_study_sessions_user_id ON study_sessions(user_id);
 CREATE INDEX idx_study_sessions_goal_id ON study_sessions(goal_id);
 CREATE INDEX idx_rewards_user_id ON rewards(user_id);
@@ -267,6 +348,38 @@ CREATE INDEX idx_ai_interactions_created_at ON ai_interactions(created_at);
 CREATE INDEX idx_notifications_user_id ON notifications(user_id);
 CREATE INDEX idx_notifications_is_read ON notifications(is_read);
 
+-- Composite keys for keyset (cursor) pagination of list endpoints
+CREATE INDEX idx_goals_user_created ON goals(user_id, created_at, id);
+CREATE INDEX idx_tasks_user_position ON tasks(user_id, position, id);
+CREATE INDEX idx_reminders_user_time ON reminders(user_id, reminder_time, id);
+CREATE INDEX idx_study_sessions_user_start ON study_sessions(user_id, start_time, id);
+CREATE INDEX idx_rewards_user_created ON rewards(user_id, created_at, id);
+
+-- Change tracking for conditional GET and /api/sync (index-only on updated_at)
+CREATE INDEX idx_goals_user_updated ON goals(user_id, updated_at);
+CREATE INDEX idx_tasks_user_updated ON tasks(user_id, updated_at);
+CREATE INDEX idx_reminders_user_updated ON reminders(user_id, updated_at);
+CREATE INDEX idx_study_sessions_user_updated ON study_sessions(user_id, updated_at);
+CREATE INDEX idx_tombstones_user_deleted ON tombstones(user_id, deleted_at);
+
+-- Full-text search (/api/search); expression indexes stay current without triggers
+CREATE INDEX idx_goals_search ON goals USING GIN (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')));
+CREATE INDEX idx_tasks_search ON tasks USING GIN (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')));
+CREATE INDEX idx_study_sessions_search ON study_sessions USING GIN (to_tsvector('english', coalesce(subject, '') || ' ' || coalesce(notes, '')));
+
+-- Tag filters (?tag=) on tasks and study sessions
+CREATE INDEX idx_tasks_tags ON tasks USING GIN (tags);
+CREATE INDEX idx_study_sessions_tags ON study_sessions USING GIN (tags);
+
+-- Covers the /api/rewards/statistics aggregate (index-only scan)
+CREATE INDEX idx_rewards_user_type_used ON rewards(user_id, reward_type, is_used, reward_value);
+
+-- Open sessions by age, for closing abandoned ones
+CREATE INDEX idx_study_sessions_open ON study_sessions(start_time) WHERE end_time IS NULL;
+
+-- Focus downsampling selects by age
+CREATE INDEX idx_focus_samples_recorded ON focus_samples(recorded_at);
+
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -304,78 +417,11 @@ CREATE TRIGGER update_groups_updated_at BEFORE UPDATE ON groups
 CREATE TRIGGER update_user_settings_updated_at BEFORE UPDATE ON user_settings
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Function to update streak on task completion
-CREATE OR REPLACE FUNCTION update_user_streak()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NEW.status = 'completed' AND OLD.status != 'completed' THEN
-        -- Update user's streak
-        INSERT INTO streaks (user_id, current_streak, longest_streak, last_activity_date, total_days_active)
-        VALUES (
-            NEW.user_id, 
-            1, 
-            1, 
-            CURRENT_DATE, 
-            1
-        )
-        ON CONFLICT (user_id, streak_type) 
-        DO UPDATE SET
-            current_streak = CASE 
-                WHEN streaks.last_activity_date = CURRENT_DATE - INTERVAL '1 day' 
-                THEN streaks.current_streak + 1
-                ELSE 1
-            END,
-            longest_streak = GREATEST(
-                streaks.longest_streak,
-                CASE 
-                    WHEN streaks.last_activity_date = CURRENT_DATE - INTERVAL '1 day' 
-                    THEN streaks.current_streak + 1
-                    ELSE 1
-                END
-            ),
-            last_activity_date = CURRENT_DATE,
-            total_days_active = streaks.total_days_active + 1,
-            updated_at = CURRENT_TIMESTAMP;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger for task completion streak update
-CREATE TRIGGER on_task_completion_streak
-    AFTER UPDATE OF status ON tasks
-    FOR EACH ROW EXECUTE FUNCTION update_user_streak();
+-- Streaks are advanced by the application (app/streaks/advance.py) with a single
+-- INSERT ... ON CONFLICT (user_id, streak_type) DO UPDATE ... RETURNING.
 
--- Function to update goal progress
-CREATE OR REPLACE FUNCTION update_goal_progress()
-RETURNS TRIGGER AS $$
-BEGIN
-    IF NEW.status = 'completed' AND OLD.status != 'completed' THEN
-        -- Update goal progress
-        UPDATE goals 
-        SET 
-            completed_minutes = completed_minutes + COALESCE(NEW.actual_minutes, 0),
-            completion_percentage = CASE 
-                WHEN target_minutes > 0 THEN 
-                    LEAST(100, ((completed_minutes + COALESCE(NEW.actual_minutes, 0)) * 100 / target_minutes)::INTEGER)
-                ELSE 0
-            END,
-            completed = CASE 
-                WHEN target_minutes > 0 AND (completed_minutes + COALESCE(NEW.actual_minutes, 0)) >= target_minutes 
-                THEN TRUE 
-                ELSE completed 
-            END,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = NEW.goal_id;
-    END IF;
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger for goal progress update
-CREATE TRIGGER on_task_completion_goal
-    AFTER UPDATE OF status ON tasks
-    FOR EACH ROW EXECUTE FUNCTION update_goal_progress();
+-- Goal progress (completed_minutes, completion_percentage) is maintained by the
+-- application in app/tasks/progress.py; run `flask reconcile-goals` to repair drift.
 
 -- Create views for common queries
 CREATE VIEW user_progress AS
@@ -414,19 +460,18 @@ LEFT JOIN goals g ON t.goal_id = g.id
 WHERE t.status IN ('pending', 'in_progress')
 ORDER BY t.due_date ASC;
 
+-- Reads the incrementally maintained rollup; filter on activity_date to use the primary key
 CREATE VIEW daily_activity AS
 SELECT 
-    u.id as user_id,
+    d.user_id,
     u.username,
-    DATE(s.start_time) as activity_date,
-    COUNT(DISTINCT s.id) as session_count,
-    SUM(s.duration_minutes) as total_minutes,
-    COUNT(DISTINCT t.id) as task_count,
-    COUNT(DISTINCT CASE WHEN t.status = 'completed' THEN t.id END) as completed_tasks
-FROM users u
-LEFT JOIN study_sessions s ON u.id = s.user_id AND DATE(s.start_time) = CURRENT_DATE
-LEFT JOIN tasks t ON u.id = t.user_id AND (t.completed_at IS NULL OR DATE(t.completed_at) = CURRENT_DATE)
-GROUP BY u.id, u.username, DATE(s.start_time);
+    d.day as activity_date,
+    d.session_count,
+    d.study_minutes as total_minutes,
+    d.tasks_completed as completed_tasks,
+    CASE WHEN d.focus_count > 0 THEN d.focus_total::NUMERIC / d.focus_count END as average_focus_score
+FROM daily_user_stats d
+JOIN users u ON u.id = d.user_id;
 
 -- Grant permissions (adjust based on your database user)
 -- GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO studybloom_user;
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Database migration script for StudyBloom
-Run this script to create all database tables
+Run this script to create all database tables and bring existing ones up to date
 """
 
 import os
@@ -11,7 +11,9 @@ from datetime import datetime, timedelta
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import inspect, text
 from app import create_app, db
+from app.rewards.rules import seed_reward_rules
 from app.models.schema import (
     User, Subscription, Goal, Task, Reminder, Streak, 
     StudySession, Reward, Group, GroupMembership, AIInteraction
@@ -26,8 +28,91 @@ def create_tables():
         db.create_all()
         print("✅ All tables created successfully!")
         
+        upgrade_schema()
+        
         # Create sample data for testing
         create_sample_data()
+
+# Streak upserts (ON CONFLICT (user_id, streak_type)) need the unique key, so
+# duplicate rows go first: keep the most recently active one, with the best longest_streak
+DEDUPE_STREAKS = [
+    """UPDATE streaks SET longest_streak = (
+        SELECT MAX(other.longest_streak) FROM streaks other
+        WHERE other.user_id = streaks.user_id AND other.streak_type = streaks.streak_type
+    )""",
+    """DELETE FROM streaks WHERE id NOT IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, streak_type
+                ORDER BY last_activity_date DESC NULLS LAST, id DESC
+            ) AS rank FROM streaks
+        ) ranked WHERE rank = 1
+    )""",
+]
+
+# A rule grants a user one reward; later duplicates keep the reward but lose the rule tag
+DEDUPE_REWARD_RULES = """UPDATE rewards SET rule_code = NULL
+    WHERE rule_code IS NOT NULL AND id NOT IN (
+        SELECT MIN(id) FROM rewards WHERE rule_code IS NOT NULL GROUP BY user_id, rule_code
+    )"""
+
+REWARD_TYPES = "'discount', 'badge', 'feature', 'feature_unlock', 'content'"
+
+def _has_unique(inspector, table, columns):
+    keys = inspector.get_unique_constraints(table) + [
+        index for index in inspector.get_indexes(table) if index['unique']
+    ]
+    return any(set(key['column_names']) == set(columns) for key in keys)
+
+def upgrade_schema():
+    """Add the columns and unique keys that create_all() can't add to existing tables,
+    and seed the reward catalog.
+
+    Safe to re-run: every step checks the live schema first.
+    """
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        streak_columns = {column['name'] for column in inspector.get_columns('streaks')}
+        if 'lapses_at' not in streak_columns:
+            connection.execute(text("ALTER TABLE streaks ADD COLUMN lapses_at TIMESTAMP"))
+            print("✅ Added streaks.lapses_at (run: flask rollover-streaks --backfill-legacy)")
+        connection.execute(text("CREATE INDEX IF NOT EXISTS idx_streaks_lapses_at ON streaks (lapses_at)"))
+
+        if not _has_unique(inspector, 'streaks', ['user_id', 'streak_type']):
+            for statement in DEDUPE_STREAKS:
+                connection.execute(text(statement))
+            connection.execute(text(
+                "CREATE UNIQUE INDEX uq_streaks_user_type ON streaks (user_id, streak_type)"
+            ))
+            print("✅ Added unique key uq_streaks_user_type")
+
+        # tasks.position is a keyset pagination key, which NULLs would break
+        connection.execute(text("UPDATE tasks SET position = 0 WHERE position IS NULL"))
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("ALTER TABLE tasks ALTER COLUMN position SET NOT NULL"))
+
+        reward_columns = {column['name'] for column in inspector.get_columns('rewards')}
+        if 'rule_code' not in reward_columns:
+            connection.execute(text("ALTER TABLE rewards ADD COLUMN rule_code VARCHAR(50)"))
+            print("✅ Added rewards.rule_code (run: flask seed-reward-rules --backfill-legacy)")
+        if not _has_unique(inspector, 'rewards', ['user_id', 'rule_code']):
+            connection.execute(text(DEDUPE_REWARD_RULES))
+            connection.execute(text(
+                "CREATE UNIQUE INDEX uq_rewards_user_rule ON rewards (user_id, rule_code)"
+            ))
+            print("✅ Added unique key uq_rewards_user_rule")
+
+        # Tables from database_schema.sql predate the feature_unlock reward type
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("ALTER TABLE rewards DROP CONSTRAINT IF EXISTS rewards_reward_type_check"))
+            connection.execute(text(
+                f"ALTER TABLE rewards ADD CONSTRAINT rewards_reward_type_check CHECK (reward_type IN ({REWARD_TYPES}))"
+            ))
+
+    # Without a catalog nothing is ever unlocked; rules already present are left as edited
+    added = seed_reward_rules()
+    if added:
+        print(f"✅ Seeded {added} reward rules")
         
 def create_sample_data():
     """Create sample data for testing"""
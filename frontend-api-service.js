@@ -35,6 +35,15 @@ class StudyBloomAPI {
     }
   }
 
+  // List endpoints return { items, next_cursor }; pass next_cursor back to get the next page
+  withPage(endpoint, { cursor, limit } = {}) {
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    if (limit) params.set('limit', limit);
+    const query = params.toString();
+    return query ? `${endpoint}?${query}` : endpoint;
+  }
+
   // Authentication
   async login(username, password) {
     return this.request('/login', {
@@ -55,8 +64,8 @@ class StudyBloomAPI {
   }
 
   // Goals Management
-  async getGoals() {
-    return this.request('/api/goals');
+  async getGoals(page = {}) {
+    return this.request(this.withPage('/api/goals', page));
   }
 
   async createGoal(goalData) {
@@ -80,8 +89,8 @@ class StudyBloomAPI {
   }
 
   // Tasks Management
-  async getTasks() {
-    return this.request('/api/tasks');
+  async getTasks(page = {}) {
+    return this.request(this.withPage('/api/tasks', page));
   }
 
   async createTask(taskData) {
@@ -120,8 +129,8 @@ class StudyBloomAPI {
   }
 
   // Study Sessions
-  async getStudySessions() {
-    return this.request('/api/study-sessions');
+  async getStudySessions(page = {}) {
+    return this.request(this.withPage('/api/study-sessions', page));
   }
 
   async startStudySession(sessionData) {
@@ -138,8 +147,8 @@ class StudyBloomAPI {
   }
 
   // Rewards
-  async getRewards() {
-    return this.request('/api/rewards');
+  async getRewards(page = {}) {
+    return this.request(this.withPage('/api/rewards', page));
   }
 
   async getAvailableRewards() {
@@ -183,8 +192,8 @@ class StudyBloomAPI {
   }
 
   // Reminders
-  async getReminders() {
-    return this.request('/api/reminders');
+  async getReminders(page = {}) {
+    return this.request(this.withPage('/api/reminders', page));
   }
 
   async createReminder(reminderData) {
@@ -198,6 +207,13 @@ class StudyBloomAPI {
     return this.request('/api/reminders/upcoming');
   }
 
+  // Search
+  async search(q, types = []) {
+    const params = new URLSearchParams({ q });
+    if (types.length) params.set('types', types.join(','));
+    return this.request(`/api/search?${params}`);
+  }
+
   // AI Integration
   async generateAIResponse(input) {
     return this.request('/ai/generate', {